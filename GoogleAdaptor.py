@@ -1,14 +1,86 @@
 import os
+import re
+import json
+import time
 import pickle
+import asyncio
+import datetime
+import uuid
+import functools
+import hashlib
+import io
+from concurrent.futures import ThreadPoolExecutor
 import gspread # gspread をインポート
+import httplib2
+import google_auth_httplib2
 
 import google.generativeai as genai
 from googleapiclient.discovery import build
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials # Credentials クラスをインポート
+from google.api_core.exceptions import GoogleAPICallError
+try:
+    from google import genai as google_genai # Batch API 用の google-genai SDK (任意)
+except ImportError:
+    google_genai = None
+try:
+    import orjson # バッチリクエスト/結果のJSONL変換を高速化するための JSON ライブラリ (任意)
+except ImportError:
+    orjson = None
 
-from utils import retry_api_call # リトライデコレータをインポート
+from tqdm import tqdm # tqdmライブラリをインポート
+
+from utils import retry_api_call, RateController, RateLimiter, TranslationCache # リトライデコレータ、同時実行数制御、呼び出し頻度制限、翻訳キャッシュをインポート
+
+# 翻訳プロンプトで共通して使用する指示事項
+_TRANSLATION_GUIDELINES = """- 専門用語（例: design pattern, dependency injection, asynchronous processing）や技術的な概念は、文脈に合わせて最も適切で一般的に使われる日本語訳を選択してください。必要であれば、カタカナ表記や英語表記のままにする方が良い場合もあります。
+- コードスニペット、変数名、関数名、クラス名、ファイルパス、APIエンドポイント、UI要素のラベルなどは、原則として翻訳せず原文のまま残してください。ただし、コメント部分はこの限りではありません。
+- 全体として、技術文書として正確性を保ちつつ、読みやすい日本語になるようにしてください。"""
+
+# 翻訳結果の先頭に付くことがある挨拶文などの前置き (その行全体と後続の改行を除去する)
+_GREETING_RE = re.compile(r'^\s*(はい、承知いたしました。|承知しました。|以下に翻訳します。|翻訳結果は以下の通りです。)[^\n]*\n+')
+
+# 1つのテキストチャンクを翻訳する際のシステム指示 (モデルに設定し、プロンプトには翻訳対象のテキストのみを含める)
+_TRANSLATION_SYSTEM_INSTRUCTION = f"""あなたはソフトウェア開発ドキュメントの翻訳を専門とするエキスパートです。
+与えられた英語のテキストを、日本のソフトウェア開発者が読むことを想定し、自然かつ正確な日本語に翻訳してください。
+
+{_TRANSLATION_GUIDELINES}
+- 応答には翻訳された日本語のテキストのみを含めてください。挨拶、前置き、後書き、翻訳に関する注釈などは一切不要です。"""
+
+# 複数のテキストチャンクをJSON配列として翻訳する際のシステム指示
+_BATCH_TRANSLATION_SYSTEM_INSTRUCTION = f"""あなたはソフトウェア開発ドキュメントの翻訳を専門とするエキスパートです。
+与えられたJSON配列に含まれる各英語テキストを、日本のソフトウェア開発者が読むことを想定し、自然かつ正確な日本語に翻訳してください。
+
+{_TRANSLATION_GUIDELINES}
+- 応答は入力と同じ順序・同じ要素数のJSON文字列配列のみとし、各要素には対応するテキストの翻訳結果だけを含めてください。"""
+
+# Docs/Drive/Sheets API の HTTP 通信のタイムアウト（秒）
+_GOOGLE_API_HTTP_TIMEOUT = 60
+
+# Docs/Drive/Sheets API 呼び出しの同時実行数を制御する AIMD コントローラ
+_workspace_rate_controller = RateController(initial_concurrency=2, max_concurrency=4)
+
+# 翻訳結果のキャッシュ (configure_translation_cache で永続化を設定可能)
+_translation_cache = TranslationCache()
+
+# Batch API のジョブが終了したとみなす状態
+_BATCH_JOB_COMPLETED_STATES = {
+    "JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED",
+}
+
+# Batch API のリクエストをインラインで送信する合計サイズの上限 (バイト)。
+# インラインリクエストは合計20MBまでのため、これを超える場合はJSONLファイルとしてアップロードする
+_BATCH_INLINE_MAX_BYTES = 10 * 1024 * 1024
+
+# 章の階層レベル (0始まり) に対応する Markdown 風の見出し記号 ("#", "##", ...)
+_HEADER_PREFIXES = ["#" * i for i in range(1, 10)]
+
+# Drive ファイルの作成操作を識別するため、作成時に appProperties に設定するキー
+_OPERATION_ID_PROPERTY = 'pdfDocTranslatorOperationId'
+
+# 英語テキストの1トークンあたりの平均文字数 (バッチ分割時のトークン数概算に使用)
+_CHARS_PER_TOKEN_ESTIMATE = 4
 
 def configure_gemini(google_api_key):
     """!
@@ -18,7 +90,8 @@ def configure_gemini(google_api_key):
     @exception Exception Gemini APIの設定に失敗した場合。
     """
     try:
-        genai.configure(api_key=google_api_key)
+        # gRPC トランスポートでは、複数のリクエストが1つの HTTP/2 接続上で多重化される
+        genai.configure(api_key=google_api_key, transport="grpc")
         print("Gemini APIの設定が完了しました。")
     except Exception as e:
         print(f"エラー: Gemini APIの設定に失敗しました。APIキーを確認してください。{e}")
@@ -26,22 +99,92 @@ def configure_gemini(google_api_key):
         # None を返すなどの方法も考えられますが、現状維持とします。
         exit(1) # エラーコード 1 で終了
 
-def authenticate_google_apis(token_pickle_file, credentials_file, scopes):
+def configure_translation_cache(cache_file=None, maxsize=4096):
+    """!
+    @brief 翻訳結果のキャッシュを設定します。
+           cache_file を指定した場合、翻訳結果はSQLiteファイルに保存され、次回以降の実行でも再利用されます。
+    @param cache_file (str | None): 永続キャッシュに使用するSQLiteファイルのパス。Noneの場合はメモリ上のみ。
+    @param maxsize (int): メモリ上に保持する翻訳結果の最大件数。
+    @return None
+    """
+    global _translation_cache
+    _translation_cache.close()
+    # プロンプトやシステム指示を変更した場合に、変更前の翻訳結果を使用しないよう、それらのハッシュをキーに含める
+    _translation_cache = TranslationCache(maxsize=maxsize, db_path=cache_file, namespace=_translation_prompt_version())
+    if cache_file:
+        print(f"翻訳キャッシュファイル '{cache_file}' を使用します。")
+
+def _migrate_pickle_token(legacy_token_pickle_file, token_json_file):
+    """!
+    @brief 旧形式 (pickle) の認証トークンファイルをJSON形式に変換し、旧ファイルを削除します。
+           JSON形式のトークンファイルが既に存在する場合や、旧ファイルが存在しない場合は何もしません。
+    @param legacy_token_pickle_file (str | None): 旧形式の認証トークンファイルのパス。
+    @param token_json_file (str): 変換後の認証トークンを保存するファイルパス。
+    @return None
+    """
+    if not legacy_token_pickle_file or os.path.exists(token_json_file) or not os.path.exists(legacy_token_pickle_file):
+        return
+    try:
+        with open(legacy_token_pickle_file, 'rb') as token:
+            creds = pickle.load(token) # 以前のバージョンが保存したファイルを一度だけ読み込む
+        _save_token(creds, token_json_file)
+        os.remove(legacy_token_pickle_file)
+        print(f"認証トークンファイル '{legacy_token_pickle_file}' をJSON形式 '{token_json_file}' に移行しました。")
+    except Exception as e:
+        print(f"警告: 旧形式の認証トークンファイル '{legacy_token_pickle_file}' の移行に失敗しました: {e}")
+
+def _save_token(creds, token_json_file):
+    """!
+    @brief 認証情報をJSON形式でトークンファイルに保存します。
+           一時ファイルに書き込んでから置き換えるため、書き込み途中のファイルが残ることはありません。
+    @param creds (google.oauth2.credentials.Credentials): 保存する認証情報。
+    @param token_json_file (str): 保存先のファイルパス。
+    @return None
+    """
+    tmp_file = f"{token_json_file}.tmp"
+    # トークンファイルは所有者のみ読み書きできる権限 (0o600) で作成する
+    fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        os.write(fd, creds.to_json().encode('utf-8'))
+    finally:
+        os.close(fd)
+    os.replace(tmp_file, token_json_file)
+
+def _load_token(token_json_file, scopes):
+    """!
+    @brief トークンファイルから認証情報を読み込みます。
+    @param token_json_file (str): 読み込むファイルパス。
+    @param scopes (list): APIアクセスに必要なスコープのリスト。
+    @return google.oauth2.credentials.Credentials | None: 読み込んだ認証情報。ファイルが存在しない場合はNone。
+    """
+    # 存在確認と読み込みを分けず、ファイルを開けなかった場合に存在しないものとして扱う
+    try:
+        fd = os.open(token_json_file, os.O_RDONLY)
+    except FileNotFoundError:
+        return None
+    try:
+        data = os.read(fd, 65536) # トークンファイルは数KB程度
+    finally:
+        os.close(fd)
+    print(f"デバッグ: 既存のトークンファイル '{token_json_file}' を読み込みました。")
+    return Credentials.from_authorized_user_info(json.loads(data), scopes)
+
+def authenticate_google_apis(token_json_file, credentials_file, scopes, legacy_token_pickle_file=None):
     """!
     @brief Google APIs (Docs, Drive, Sheets) の認証を行い、サービスオブジェクト/クライアントを返します。
            認証情報が存在しない、または無効な場合は、OAuth 2.0フローを実行して認証情報を取得・保存します。
-    @param token_pickle_file (str): 認証トークンを保存/読み込みするファイルパス。
+    @param token_json_file (str): 認証トークンを保存/読み込みするファイルパス (JSON形式)。
     @param credentials_file (str): Google Cloudからダウンロードした認証情報ファイル (JSON) のパス。
     @param scopes (list): APIアクセスに必要なスコープのリスト。
-    @return tuple(googleapiclient.discovery.Resource, googleapiclient.discovery.Resource, gspread.Client) | tuple(None, None, None):
-            認証成功時はDocsサービス、Driveサービス、gspreadクライアントのタプル。
-            失敗時は (None, None, None)。
-    """
-    creds = None
-    if os.path.exists(token_pickle_file):
-        with open(token_pickle_file, 'rb') as token:
-            print(f"デバッグ: 既存のトークンファイル '{token_pickle_file}' を読み込みます。")
-            creds = pickle.load(token)
+    @param legacy_token_pickle_file (str | None): 旧形式 (pickle) の認証トークンファイルのパス。
+           存在する場合はJSON形式に移行してから読み込みます。
+    @return tuple(googleapiclient.discovery.Resource, googleapiclient.discovery.Resource, gspread.Client, googleapiclient.discovery.Resource, googleapiclient.discovery.Resource) | tuple(None, None, None, None, None):
+            認証成功時はDocsサービス、Driveサービス、gspreadクライアント、Sheetsサービス、
+            スプレッドシート保存用のDriveサービスのタプル。
+            失敗時は (None, None, None, None, None)。
+    """
+    _migrate_pickle_token(legacy_token_pickle_file, token_json_file)
+    creds = _load_token(token_json_file, scopes)
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
             try:
@@ -59,7 +202,7 @@ def authenticate_google_apis(token_pickle_file, credentials_file, scopes):
             if not os.path.exists(credentials_file):
                 print(f"エラー: 認証情報ファイル '{credentials_file}' が見つかりません。")
                 print("Google Cloud Consoleから認証情報ファイル (credentials.json) をダウンロードし、指定されたパスに配置してください。")
-                return None, None, None
+                return None, None, None, None, None
             print("認証情報が見つからないか無効です。新規認証を開始します。")
             print(f"デバッグ: 新規認証フローを開始します。Scopes: {scopes}")
             print("ブラウザを開いて認証を行ってください。")
@@ -67,41 +210,112 @@ def authenticate_google_apis(token_pickle_file, credentials_file, scopes):
             creds = flow.run_local_server(port=0)
             print("デバッグ: run_local_server が完了しました。")
     try:
-        docs_service = build('docs', 'v1', credentials=creds)
+        # Docs/Drive の各サービスで1つの HTTP クライアントを共有し、接続を再利用する
+        # (サービスごとに httplib2.Http を生成すると、その都度 TLS ハンドシェイクが発生する)
+        # ディスカバリドキュメントはライブラリに同梱されたものを使用し、ネットワークから取得しない
+        # (起動時の通信を省き、取得失敗による認証エラーも避ける。同梱版を使うためキャッシュも不要)
+        authed_http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http(timeout=_GOOGLE_API_HTTP_TIMEOUT))
+        docs_service = build('docs', 'v1', http=authed_http, static_discovery=True, cache_discovery=False)
         # gspread は credentials オブジェクトを直接使用する
         gspread_client = gspread.authorize(creds)
-        drive_service = build('drive', 'v3', credentials=creds)
+        drive_service = build('drive', 'v3', http=authed_http, static_discovery=True, cache_discovery=False)
+        # 大量の行の書き込みには gspread を介さず Sheets API を直接使用する
+        # スプレッドシートへの保存はドキュメントへの保存と別スレッドで並行して行われるため、
+        # スレッドセーフでない httplib2.Http は共有せず、専用のものを使用する
+        # (保存時に使用する Drive API も、ドキュメント用の Driveサービスとは別に専用の HTTP クライアントで構築する)
+        sheets_http = google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http(timeout=_GOOGLE_API_HTTP_TIMEOUT))
+        sheets_service = build('sheets', 'v4', http=sheets_http, static_discovery=True, cache_discovery=False)
+        sheets_drive_service = build('drive', 'v3', http=sheets_http, static_discovery=True, cache_discovery=False)
         print("Google API認証成功。")
-        return docs_service, drive_service, gspread_client
+        # アクセストークンの更新は、期限切れの際に各トランスポート (AuthorizedHttp / gspread) が必要に応じて行う
+        # (同じ認証情報を別スレッドからも更新すると、更新処理やトークンファイルの書き込みが競合する)
+        return docs_service, drive_service, gspread_client, sheets_service, sheets_drive_service
     except gspread.exceptions.APIError as ge: # gspread固有のAPIエラーをキャッチ
         print(f"エラー: gspread APIエラーが発生しました: {ge}")
-        return None, None, None
+        return None, None, None, None, None
     except Exception as e:
         print(f"Google APIサービスオブジェクトの構築に失敗しました: {e}")
         # 認証情報が原因である可能性を考慮し、古いトークンファイルを削除
-        if os.path.exists(token_pickle_file):
+        if os.path.exists(token_json_file):
             try:
-                os.remove(token_pickle_file)
-                print(f"古い認証トークンファイル '{token_pickle_file}' を削除しました。")
+                os.remove(token_json_file)
+                print(f"古い認証トークンファイル '{token_json_file}' を削除しました。")
                 print("スクリプトを再実行して再認証してください。")
             except OSError as oe:
-                print(f"警告: 古い認証トークンファイル '{token_pickle_file}' の削除に失敗しました: {oe}")
-        return None, None, None
+                print(f"警告: 古い認証トークンファイル '{token_json_file}' の削除に失敗しました: {oe}")
+        return None, None, None, None, None
     finally:
         # 認証が成功した場合（またはリフレッシュ/新規認証後）にトークンを保存
         if creds and creds.valid: # 有効な認証情報がある場合のみ保存
-            with open(token_pickle_file, 'wb') as token:
-                pickle.dump(creds, token)
-                print(f"認証情報を '{token_pickle_file}' に保存しました。")
+            _save_token(creds, token_json_file)
+            print(f"認証情報を '{token_json_file}' に保存しました。")
+
+@functools.lru_cache(maxsize=4)
+def _get_model(model_name, system_instruction=_TRANSLATION_SYSTEM_INSTRUCTION):
+    """!
+    @brief システム指示を設定したGeminiモデルのオブジェクトを返します。
+           同じ引数に対しては生成済みのオブジェクトを再利用します。
+    @param model_name (str): 使用するGeminiモデルの名前。
+    @param system_instruction (str): モデルに設定するシステム指示。
+    @return genai.GenerativeModel: Geminiモデルのオブジェクト。
+    """
+    return genai.GenerativeModel(model_name, system_instruction=system_instruction)
+
+def _build_translation_prompt(text_chunk):
+    """!
+    @brief 1つのテキストチャンクを翻訳するためのプロンプトを作成します。
+           翻訳の指示は _TRANSLATION_SYSTEM_INSTRUCTION としてモデル側に設定します。
+    @param text_chunk (str): 翻訳対象の英語テキストチャンク。
+    @return str: Gemini APIに渡すプロンプト。
+    """
+    return f"""--- English Text ---
+{text_chunk}
+--- End English Text ---
+
+--- Japanese Translation ---
+"""
+
+def _build_batch_translation_prompt(batch_chunks):
+    """!
+    @brief 複数チャンクをJSON配列として翻訳するためのプロンプトを作成します。
+    @param batch_chunks (list[str]): 翻訳対象の英語テキストチャンクのリスト。
+    @return str: Gemini APIに渡すプロンプト。
+    """
+    return f"""--- English Texts (JSON) ---
+{json.dumps(batch_chunks, ensure_ascii=False)}
+--- End English Texts ---
+"""
+
+def _translation_prompt_version():
+    """!
+    @brief 翻訳に使用するプロンプトとシステム指示のハッシュを返します (翻訳キャッシュのキーに使用)。
+    @return str: SHA-256ハッシュの16進文字列。
+    """
+    prompt_parts = (_TRANSLATION_SYSTEM_INSTRUCTION, _BATCH_TRANSLATION_SYSTEM_INSTRUCTION,
+                    _build_translation_prompt(""), _build_batch_translation_prompt([]))
+    return hashlib.sha256("\0".join(prompt_parts).encode('utf-8')).hexdigest()
+
+def _clean_translation(raw_translation):
+    """!
+    @brief 翻訳結果の先頭に含まれる挨拶文などの前置きを除去します。
+    @param raw_translation (str): Gemini APIから返された翻訳テキスト。
+    @return str: 前置きを除去した翻訳テキスト。
+    """
+    # --- 前置きを除去する処理 (注意: 簡易的な実装であり、誤作動の可能性あり) ---
+    # プロンプトで応答形式を厳密に制御できている場合、この処理は不要/簡略化できる可能性が高い
+    # 最初の行が一般的な応答パターンに一致する場合、その行を除去する
+    return _GREETING_RE.sub('', raw_translation, count=1).strip()
 
-def translate_text_chunk(text_chunk, model_name, max_retries=2, initial_delay=5):
+def translate_text_chunk(text_chunk, model_name, max_retries=3, initial_delay=1, rate_controller=None, rate_limiter=None):
     """!
     @brief Gemini APIを使用して指定されたテキストチャンクを英語から日本語に翻訳します。
            API呼び出し時にエラーが発生した場合、リトライ処理を行います。
     @param text_chunk (str): 翻訳対象の英語テキストチャンク。
     @param model_name (str): 使用するGeminiモデルの名前 (例: "gemini-pro")。
     @param max_retries (int): 最大リトライ回数。
-    @param initial_delay (float): 初回のリトライ待機時間（秒）。
+    @param initial_delay (float): リトライ待機時間の基準値（秒）。
+    @param rate_controller (utils.RateController | None): API呼び出しの同時実行数を制御するコントローラ。
+    @param rate_limiter (utils.RateLimiter | None): API呼び出しの頻度 (1分あたりのリクエスト数) を制限するリミッタ。
     @return str: 翻訳された日本語テキスト。翻訳に失敗した場合は空文字列。
     @exception Exception 翻訳API呼び出し中に予期せぬエラーが発生した場合。
            リトライしても成功しなかった場合も含む。
@@ -110,53 +324,33 @@ def translate_text_chunk(text_chunk, model_name, max_retries=2, initial_delay=5)
         print("警告: 翻訳対象のテキストが空です。スキップします。")
         return ""
     # --- ここまで ---
+    cached_translation = _translation_cache.get(model_name, text_chunk)
+    if cached_translation is not None: # 同一テキストの翻訳済み結果があればAPIを呼び出さない
+        return cached_translation
     try:
-        model = genai.GenerativeModel(model_name)
-        # プロンプトを調整：翻訳のみを出力するように指示を追加
-        # ソフトウェア開発ドキュメントの翻訳に特化したプロンプト
-        prompt = f"""あなたはソフトウェア開発ドキュメントの翻訳を専門とするエキスパートです。
-以下の英語のテキストを、日本のソフトウェア開発者が読むことを想定し、自然かつ正確な日本語に翻訳してください。
-
-- 専門用語（例: design pattern, dependency injection, asynchronous processing）や技術的な概念は、文脈に合わせて最も適切で一般的に使われる日本語訳を選択してください。必要であれば、カタカナ表記や英語表記のままにする方が良い場合もあります。
-- コードスニペット、変数名、関数名、クラス名、ファイルパス、APIエンドポイント、UI要素のラベルなどは、原則として翻訳せず原文のまま残してください。ただし、コメント部分はこの限りではありません。
-- 全体として、技術文書として正確性を保ちつつ、読みやすい日本語になるようにしてください。
-- 応答には翻訳された日本語のテキストのみを含めてください。挨拶、前置き、後書き、翻訳に関する注釈などは一切不要です。
-
---- English Text ---
-{text_chunk}
---- End English Text ---
-
---- Japanese Translation ---
-"""
+        model = _get_model(model_name)
+        prompt = _build_translation_prompt(text_chunk)
         # --- リトライデコレータを適用した内部関数 ---
-        @retry_api_call(max_retries=max_retries, initial_delay=initial_delay)
+        @retry_api_call(max_retries=max_retries, initial_delay=initial_delay, rate_controller=rate_controller,
+                        rate_limiter=rate_limiter)
         def _generate_content_with_retry():
-            return model.generate_content(prompt)
+            # ストリーミングで受信し、生成の完了を待たずに受信済みの部分から順に取り出す
+            # (ストリームの途中で発生したエラーもリトライの対象とするため、受信までを内部関数に含める)
+            response_stream = model.generate_content(prompt, stream=True)
+            buffer = []
+            for response_chunk in response_stream:
+                buffer.extend(part.text for part in response_chunk.parts)
+            return "".join(buffer)
         # --- 内部関数ここまで ---
 
-        response = _generate_content_with_retry()
-
-        # レスポンスオブジェクトから翻訳テキストを抽出
-        raw_translation = ""
-        if hasattr(response, 'text'):
-            raw_translation = response.text
-        elif response.parts:
-            raw_translation = "".join(part.text for part in response.parts)
-        else:
-            print("警告: 予期しないレスポンス形式です。")
-            print(f"レスポンス内容: {response}")
+        raw_translation = _generate_content_with_retry()
+        if not raw_translation:
+            print("警告: 翻訳結果のテキストが空です。")
             return "" # 空文字を返す
 
-        # --- 前置きを除去する処理 (注意: 簡易的な実装であり、誤作動の可能性あり) ---
-        # プロンプトで応答形式を厳密に制御できている場合、この処理は不要/簡略化できる可能性が高い
-        lines = raw_translation.strip().split('\n')
-        # 最初の行が一般的な応答パターンに一致するか確認
-        common_greetings = ["はい、承知いたしました。", "承知しました。", "以下に翻訳します。", "翻訳結果は以下の通りです。"]
-        cleaned_translation = raw_translation.strip() # デフォルトは元のテキスト
-        if lines and any(lines[0].strip().startswith(greeting) for greeting in common_greetings):
-            # 最初の行が挨拶文パターンに一致する場合、それ以降の行を結合する (空行も考慮)
-            cleaned_translation = "\n".join(line for i, line in enumerate(lines) if i > 0 or line.strip()).strip()
-
+        cleaned_translation = _clean_translation(raw_translation)
+        if cleaned_translation:
+            _translation_cache.put(model_name, text_chunk, cleaned_translation)
         return cleaned_translation # クリーニング後のテキストを返す
 
     except Exception as e:
@@ -166,8 +360,478 @@ def translate_text_chunk(text_chunk, model_name, max_retries=2, initial_delay=5)
         raise # キャッチした例外を再スローする
         # リトライデコレータが最終的なエラーを送出する
 
+def _collect_uncached_chunks(text_chunks, model_name, translated):
+    """!
+    @brief 翻訳キャッシュを参照し、キャッシュ済みのチャンクの翻訳結果を translated に格納します。
+           キャッシュにないチャンクのうち、同じテキスト (改行コードと行末の空白の違いを除く) のチャンクは最初の1つだけを翻訳対象とします。
+    @param text_chunks (list[str]): 翻訳対象の英語テキストチャンクのリスト。
+    @param model_name (str): 使用するGeminiモデルの名前。
+    @param translated (list): 翻訳結果を格納するリスト (text_chunks と同じ長さ)。
+    @return tuple[list[int], dict[int, int]]: 翻訳APIの呼び出しが必要なチャンク (空でなく、キャッシュにないもの) の
+            インデックスのリストと、重複したチャンクのインデックスから翻訳対象のチャンクのインデックスへの辞書。
+    """
+    uncached_indices = []
+    duplicate_of = {} # 重複チャンクのインデックス -> 同じテキストで翻訳対象となるチャンクのインデックス
+    first_index_by_key = {} # キャッシュのキー -> そのテキストで最初に見つかったチャンクのインデックス
+    num_cached = 0
+    for i, chunk in enumerate(text_chunks):
+        if not chunk or not chunk.strip():
+            continue
+        cached_translation = _translation_cache.get(model_name, chunk)
+        if cached_translation is not None:
+            translated[i] = cached_translation
+            num_cached += 1
+            continue
+        key = TranslationCache.make_key(model_name, chunk)
+        if key in first_index_by_key:
+            duplicate_of[i] = first_index_by_key[key]
+        else:
+            first_index_by_key[key] = i
+            uncached_indices.append(i)
+    if num_cached:
+        print(f"{num_cached} 個のチャンクは翻訳キャッシュから取得しました。")
+    if duplicate_of:
+        print(f"{len(duplicate_of)} 個のチャンクは同じテキストのチャンクの翻訳結果を使用します。")
+    return uncached_indices, duplicate_of
+
+def _fill_duplicate_chunks(translated, duplicate_of):
+    """!
+    @brief 重複したチャンクに、同じテキストのチャンクの翻訳結果 (または例外) を格納します。
+    @param translated (list): 翻訳結果を格納するリスト。
+    @param duplicate_of (dict[int, int]): _collect_uncached_chunks が返す、重複チャンクの対応表。
+    """
+    for duplicate_index, source_index in duplicate_of.items():
+        translated[duplicate_index] = translated[source_index]
+
+def _estimate_tokens(text):
+    """!
+    @brief テキストの入力トークン数を文字数から簡易的に見積もります。
+    @param text (str): 見積もり対象のテキスト。
+    @return int: 見積もったトークン数。
+    """
+    return len(text) // _CHARS_PER_TOKEN_ESTIMATE + 1
+
+def _group_chunks_by_tokens(chunk_indices, text_chunks, max_batch_tokens):
+    """!
+    @brief 翻訳対象のチャンクを、見積もりトークン数の合計が上限を超えないバッチにまとめます。
+           単独で上限を超えるチャンクは、それだけで1つのバッチになります。
+    @param chunk_indices (list[int]): バッチにまとめるチャンクのインデックスのリスト (順序を維持)。
+    @param text_chunks (list[str]): 全チャンクのリスト。
+    @param max_batch_tokens (int): 1バッチあたりの見積もり入力トークン数の上限。
+    @return list[list[int]]: チャンクインデックスのリストのリスト。
+    """
+    batches = []
+    current_batch = []
+    current_tokens = 0
+    for index in chunk_indices:
+        tokens = _estimate_tokens(text_chunks[index])
+        if current_batch and current_tokens + tokens > max_batch_tokens:
+            batches.append(current_batch)
+            current_batch = []
+            current_tokens = 0
+        current_batch.append(index)
+        current_tokens += tokens
+    if current_batch:
+        batches.append(current_batch)
+    return batches
+
+def _translate_batch_as_json(batch_chunks, model_name, max_retries, initial_delay, rate_controller=None, rate_limiter=None):
+    """!
+    @brief 複数のテキストチャンクをJSON配列として1回のGemini API呼び出しで翻訳します。
+    @param batch_chunks (list[str]): 翻訳対象の英語テキストチャンクのリスト。
+    @param model_name (str): 使用するGeminiモデルの名前。
+    @param max_retries (int): 最大リトライ回数。
+    @param initial_delay (float): リトライ待機時間の基準値（秒）。
+    @param rate_controller (utils.RateController | None): API呼び出しの同時実行数を制御するコントローラ。
+    @param rate_limiter (utils.RateLimiter | None): API呼び出しの頻度 (1分あたりのリクエスト数) を制限するリミッタ。
+    @return list[str] | None: 入力と同じ順序の翻訳結果のリスト。
+            応答がJSONとして解釈できない場合や要素数が一致しない場合は None。
+    """
+    model = _get_model(model_name, _BATCH_TRANSLATION_SYSTEM_INSTRUCTION)
+    prompt = _build_batch_translation_prompt(batch_chunks)
+
+    @retry_api_call(max_retries=max_retries, initial_delay=initial_delay, rate_controller=rate_controller,
+                    rate_limiter=rate_limiter)
+    def _generate_json_with_retry():
+        return model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
+
+    response = _generate_json_with_retry()
+    try:
+        result = json.loads(response.text)
+    except (ValueError, TypeError) as e: # JSONの解析失敗、またはブロック等で response.text が取得できない場合
+        print(f"警告: バッチ翻訳の応答をJSONとして解釈できませんでした: {e}")
+        return None
+
+    if not isinstance(result, list) or len(result) != len(batch_chunks) or not all(isinstance(t, str) for t in result):
+        print(f"警告: バッチ翻訳の応答の要素数が一致しません (入力: {len(batch_chunks)}件)。")
+        return None
+    return [t.strip() for t in result]
+
+async def _run_in_executor(executor, func, *args, **kwargs):
+    """!
+    @brief 同期関数をスレッドプールで実行し、イベントループをブロックせずに結果を待ちます。
+    @param executor (concurrent.futures.ThreadPoolExecutor): 実行に使用するスレッドプール。
+    @param func (callable): 実行する同期関数。
+    @return 関数の戻り値。
+    """
+    # google.generativeai の非同期クライアントは最初のイベントループに束縛されたままキャッシュされるため、
+    # スレッドセーフな同期クライアントをワーカースレッドから呼び出す
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+def _is_server_error(e):
+    """!
+    @brief 例外がGemini APIのサーバー側エラー (5xx) かどうかを判定します。
+    @param e (Exception): 判定する例外オブジェクト。
+    @return bool: サーバー側エラーの場合は True。
+    """
+    return isinstance(e, GoogleAPICallError) and e.code is not None and e.code >= 500
+
+async def translate_text_chunks_async(text_chunks, model_name, max_retries=3, initial_delay=1,
+                                      max_batch_tokens=6000, sleep_time=0, max_workers=5, requests_per_minute=None,
+                                      fallback_model_name=None):
+    """!
+    @brief 複数のテキストチャンクをまとめて英語から日本語に翻訳します (非同期版)。
+           チャンクは見積もりトークン数の上限を超えない範囲でバッチにまとめられ、
+           バッチごとに1回のGemini API呼び出し (JSON配列形式) で翻訳されます。
+           応答の要素数が一致しない場合などは、そのバッチをチャンクごとの翻訳にフォールバックします。
+           各バッチは並行して処理され、同時実行数は AIMD 方式の RateController により
+           レート制限の発生状況に応じて max_workers を上限に自動調整されます。
+           requests_per_minute を指定した場合は、リトライを含むAPI呼び出しの頻度をその値以下に制限します。
+           fallback_model_name を指定した場合、リトライしてもサーバー側エラー (5xx) が続いたチャンクは
+           そのモデルで翻訳し直します。
+    @param text_chunks (list[str]): 翻訳対象の英語テキストチャンクのリスト。
+    @param model_name (str): 使用するGeminiモデルの名前。
+    @param max_retries (int): 最大リトライ回数。
+    @param initial_delay (float): リトライ待機時間の基準値（秒）。
+    @param max_batch_tokens (int): 1バッチあたりの見積もり入力トークン数の上限。
+    @param sleep_time (float): 同時実行枠ごとのAPI呼び出し間の待機時間（秒）。
+    @param max_workers (int): 同時に実行するAPI呼び出しの最大数。
+    @param requests_per_minute (int | None): 1分あたりのAPI呼び出し回数の上限。Noneの場合は制限しない。
+    @param fallback_model_name (str | None): サーバー側エラーが続いた場合に使用する代替モデルの名前。Noneの場合は代替しない。
+    @return list[str | Exception]: 入力と同じ順序の翻訳結果のリスト。
+            翻訳に失敗したチャンクの要素には、発生した例外オブジェクトが格納されます。
+    """
+    translated = [""] * len(text_chunks) # 空のチャンクは翻訳せず空文字とする
+    chunk_indices, duplicate_of = _collect_uncached_chunks(text_chunks, model_name, translated)
+    batches = _group_chunks_by_tokens(chunk_indices, text_chunks, max_batch_tokens)
+    print(f"{len(chunk_indices)} 個のチャンクを {len(batches)} 個のバッチにまとめて翻訳します (同時実行数: {max_workers})。")
+
+    semaphore = asyncio.Semaphore(max_workers) # ワーカースレッド数の上限
+    rate_controller = RateController(initial_concurrency=min(5, max_workers), max_concurrency=max_workers)
+    rate_limiter = RateLimiter(requests_per_minute) if requests_per_minute else None
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    progress = tqdm(total=len(batches), desc="翻訳バッチ処理", unit="バッチ")
+
+    async def _translate_batch(batch):
+        """1つのバッチを翻訳し、結果を translated の対応する位置に格納する。"""
+        async with semaphore:
+            batch_result = None
+            if len(batch) > 1:
+                try:
+                    batch_result = await _run_in_executor(executor, _translate_batch_as_json, [text_chunks[i] for i in batch],
+                                                          model_name, max_retries, initial_delay, rate_controller, rate_limiter)
+                except Exception as e:
+                    print(f"警告: バッチ翻訳中にエラーが発生しました: {e}。チャンクごとの翻訳にフォールバックします。")
+                await asyncio.sleep(sleep_time) # 翻訳APIへの負荷軽減のため待機
+            if batch_result is not None:
+                for i, text in zip(batch, batch_result):
+                    translated[i] = text
+                    if text:
+                        _translation_cache.put(model_name, text_chunks[i], text)
+            else:
+                # 単独チャンクのバッチ、またはバッチ翻訳に失敗した場合はチャンクごとに翻訳
+                # (各チャンクは独立しているため並行して翻訳し、同時実行数と呼び出し頻度は
+                #  rate_controller と rate_limiter で全体として制御する)
+                results = await asyncio.gather(
+                    *(_run_in_executor(executor, translate_text_chunk, text_chunks[i],
+                                       model_name, max_retries, initial_delay, rate_controller, rate_limiter)
+                      for i in batch),
+                    return_exceptions=True)
+                if fallback_model_name:
+                    # 障害や過負荷でサーバー側エラーが続いたチャンクは、代替モデルで翻訳し直す
+                    server_error_indices = [j for j, result in enumerate(results) if _is_server_error(result)]
+                    if server_error_indices:
+                        print(f"警告: {len(server_error_indices)} 個のチャンクでサーバー側エラーが続いたため、モデル '{fallback_model_name}' で再翻訳します。")
+                        fallback_results = await asyncio.gather(
+                            *(_run_in_executor(executor, translate_text_chunk, text_chunks[batch[j]],
+                                               fallback_model_name, max_retries, initial_delay, rate_controller, rate_limiter)
+                              for j in server_error_indices),
+                            return_exceptions=True)
+                        for j, result in zip(server_error_indices, fallback_results):
+                            results[j] = result
+                for i, result in zip(batch, results):
+                    translated[i] = result # 失敗したチャンクは、呼び出し元で章ごとのエラー処理ができるよう例外を格納
+                await asyncio.sleep(sleep_time)
+        progress.update(1)
+
+    try:
+        await asyncio.gather(*(_translate_batch(batch) for batch in batches))
+    finally:
+        progress.close()
+        executor.shutdown(wait=False)
+    _fill_duplicate_chunks(translated, duplicate_of)
+    return translated
+
+def translate_text_chunks(text_chunks, model_name, max_retries=3, initial_delay=1,
+                          max_batch_tokens=6000, sleep_time=0, max_workers=5, requests_per_minute=None,
+                          fallback_model_name=None):
+    """!
+    @brief translate_text_chunks_async を同期的に実行するラッパーです。
+           引数と戻り値は translate_text_chunks_async と同じです。
+    @param text_chunks (list[str]): 翻訳対象の英語テキストチャンクのリスト。
+    @param model_name (str): 使用するGeminiモデルの名前。
+    @param max_retries (int): 最大リトライ回数。
+    @param initial_delay (float): リトライ待機時間の基準値（秒）。
+    @param max_batch_tokens (int): 1バッチあたりの見積もり入力トークン数の上限。
+    @param sleep_time (float): 同時実行枠ごとのAPI呼び出し間の待機時間（秒）。
+    @param max_workers (int): 同時に実行するAPI呼び出しの最大数。
+    @param requests_per_minute (int | None): 1分あたりのAPI呼び出し回数の上限。Noneの場合は制限しない。
+    @param fallback_model_name (str | None): サーバー側エラーが続いた場合に使用する代替モデルの名前。Noneの場合は代替しない。
+    @return list[str | Exception]: 入力と同じ順序の翻訳結果のリスト。
+    """
+    return asyncio.run(translate_text_chunks_async(text_chunks, model_name, max_retries, initial_delay,
+                                                   max_batch_tokens, sleep_time, max_workers, requests_per_minute,
+                                                   fallback_model_name))
+
+def _dump_json_line(obj):
+    """!
+    @brief オブジェクトをJSONL形式の1行 (UTF-8 のバイト列、改行を含む) に変換します。
+           orjson がインストールされている場合は orjson を、なければ標準の json モジュールを使用します。
+    @param obj (dict): 変換するオブジェクト。
+    @return bytes: JSONL形式の1行。
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8') + b"\n"
+
+def _load_json(data):
+    """!
+    @brief JSON文字列 (str または UTF-8 のバイト列) を解析します。
+           orjson がインストールされている場合は orjson を、なければ標準の json モジュールを使用します。
+    @param data (str | bytes): 解析するJSON。
+    @return 解析したオブジェクト。
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _create_inline_batch_job(client, model_name, text_chunks, chunk_indices):
+    """!
+    @brief 翻訳リクエストをインラインで送信し、Batch API のジョブを作成します。
+    @param client (google.genai.Client): google-genai のクライアント。
+    @param model_name (str): 使用するGeminiモデルの名前。
+    @param text_chunks (list[str]): 全チャンクのリスト。
+    @param chunk_indices (list[int]): 翻訳するチャンクのインデックスのリスト。
+    @return google.genai.types.BatchJob: 作成したバッチジョブ。
+    """
+    inline_requests = [
+        {
+            'contents': [{'parts': [{'text': _build_translation_prompt(text_chunks[i])}], 'role': 'user'}],
+            'config': {'system_instruction': _TRANSLATION_SYSTEM_INSTRUCTION},
+            'metadata': {'custom_id': str(i)},
+        }
+        for i in chunk_indices
+    ]
+    return client.batches.create(
+        model=model_name,
+        src=inline_requests,
+        config={'display_name': 'PDFDocTranslator'},
+    )
+
+def _create_file_batch_job(client, model_name, text_chunks, chunk_indices):
+    """!
+    @brief 翻訳リクエストをJSONLファイルとしてアップロードし、Batch API のジョブを作成します。
+           インラインリクエストのサイズ上限を超える大きなドキュメントに使用します。
+    @param client (google.genai.Client): google-genai のクライアント。
+    @param model_name (str): 使用するGeminiモデルの名前。
+    @param text_chunks (list[str]): 全チャンクのリスト。
+    @param chunk_indices (list[int]): 翻訳するチャンクのインデックスのリスト。
+    @return google.genai.types.BatchJob: 作成したバッチジョブ。
+    """
+    # 1行に1リクエスト ({"key": チャンクのインデックス, "request": GenerateContentRequest}) を書き込む
+    jsonl = io.BytesIO()
+    for i in chunk_indices:
+        line = {
+            'key': str(i),
+            'request': {
+                'contents': [{'parts': [{'text': _build_translation_prompt(text_chunks[i])}], 'role': 'user'}],
+                'system_instruction': {'parts': [{'text': _TRANSLATION_SYSTEM_INSTRUCTION}]},
+            },
+        }
+        jsonl.write(_dump_json_line(line))
+    jsonl.seek(0)
+    uploaded_file = client.files.upload(file=jsonl, config={'display_name': 'PDFDocTranslator', 'mime_type': 'jsonl'})
+    print(f"バッチリクエストのファイルをアップロードしました。ファイル名: {uploaded_file.name}")
+    return client.batches.create(
+        model=model_name,
+        src=uploaded_file.name,
+        config={'display_name': 'PDFDocTranslator'},
+    )
+
+def _store_batch_translation(translated, text_chunks, model_name, chunk_index, raw_translation):
+    """!
+    @brief Batch API の応答テキストを整形して translated に格納し、翻訳キャッシュに保存します。
+    @param translated (list): 翻訳結果を格納するリスト。
+    @param text_chunks (list[str]): 全チャンクのリスト。
+    @param model_name (str): 使用したGeminiモデルの名前。
+    @param chunk_index (int): 応答に対応するチャンクのインデックス。
+    @param raw_translation (str): 応答のテキスト。
+    """
+    translated[chunk_index] = _clean_translation(raw_translation or "")
+    if translated[chunk_index]:
+        _translation_cache.put(model_name, text_chunks[chunk_index], translated[chunk_index])
+
+def _read_inline_batch_results(batch_job, chunk_indices, translated, text_chunks, model_name):
+    """!
+    @brief インラインで作成したバッチジョブの応答から、各チャンクの翻訳結果を格納します。
+    @param batch_job (google.genai.types.BatchJob): 正常に終了したバッチジョブ。
+    @param chunk_indices (list[int]): リクエストした順のチャンクのインデックスのリスト。
+    @param translated (list): 翻訳結果を格納するリスト。
+    @param text_chunks (list[str]): 全チャンクのリスト。
+    @param model_name (str): 使用したGeminiモデルの名前。
+    """
+    for position, inline_response in enumerate(batch_job.dest.inlined_responses or []):
+        metadata = inline_response.metadata or {}
+        chunk_index = int(metadata['custom_id']) if 'custom_id' in metadata else chunk_indices[position]
+        if inline_response.error:
+            translated[chunk_index] = RuntimeError(f"バッチ翻訳エラー: {inline_response.error}")
+            continue
+        try:
+            _store_batch_translation(translated, text_chunks, model_name, chunk_index, inline_response.response.text)
+        except Exception as e: # 応答がブロックされた場合など
+            translated[chunk_index] = e
+
+def _read_file_batch_results(client, batch_job, translated, text_chunks, model_name):
+    """!
+    @brief JSONLファイルで作成したバッチジョブの結果ファイルをダウンロードし、各チャンクの翻訳結果を格納します。
+    @param client (google.genai.Client): google-genai のクライアント。
+    @param batch_job (google.genai.types.BatchJob): 正常に終了したバッチジョブ。
+    @param translated (list): 翻訳結果を格納するリスト。
+    @param text_chunks (list[str]): 全チャンクのリスト。
+    @param model_name (str): 使用したGeminiモデルの名前。
+    """
+    result_bytes = client.files.download(file=batch_job.dest.file_name)
+    for line in result_bytes.splitlines(): # 文字列にデコードせず、バイト列のまま各行を解析する
+        if not line.strip():
+            continue
+        result = _load_json(line)
+        chunk_index = int(result['key'])
+        if 'error' in result or 'response' not in result:
+            translated[chunk_index] = RuntimeError(f"バッチ翻訳エラー: {result.get('error')}")
+            continue
+        try:
+            parts = result['response']['candidates'][0]['content']['parts']
+            _store_batch_translation(translated, text_chunks, model_name, chunk_index,
+                                     "".join(part.get('text', '') for part in parts))
+        except (KeyError, IndexError, TypeError) as e: # 応答がブロックされ候補が含まれない場合など
+            translated[chunk_index] = RuntimeError(f"バッチ翻訳の応答からテキストを取得できませんでした: {e!r}")
+
+def translate_text_chunks_batch(text_chunks, model_name, google_api_key, max_retries=3, initial_delay=1,
+                                min_batch_chunks=8, poll_interval=10, max_poll_interval=60, **kwargs):
+    """!
+    @brief Gemini Batch API を使用して、複数のテキストチャンクを1つのバッチジョブで翻訳します。
+           全チャンクをリクエストとしてまとめて送信し、ジョブが終了するまでポーリングします。
+           リクエストの合計サイズが大きい場合は、インラインではなくJSONLファイルとしてアップロードします。
+           レイテンシは大きくなりますが、通常のAPI呼び出しより低コストで大量のチャンクを処理できます。
+           チャンク数が min_batch_chunks 未満の場合や google-genai SDK が利用できない場合、
+           またはジョブが失敗した場合は translate_text_chunks にフォールバックします。
+    @param text_chunks (list[str]): 翻訳対象の英語テキストチャンクのリスト。
+    @param model_name (str): 使用するGeminiモデルの名前。
+    @param google_api_key (str): Google CloudプロジェクトのAPIキー。
+    @param max_retries (int): フォールバック時の最大リトライ回数。
+    @param initial_delay (float): フォールバック時のリトライ待機時間の基準値（秒）。
+    @param min_batch_chunks (int): Batch API を使用する最小チャンク数。
+    @param poll_interval (float): ジョブ状態の初回のポーリング間隔（秒）。
+    @param max_poll_interval (float): ジョブ状態のポーリング間隔の上限（秒）。
+    @param kwargs: フォールバック時に translate_text_chunks に渡す追加の引数。
+    @return list[str | Exception]: 入力と同じ順序の翻訳結果のリスト。
+            翻訳に失敗したチャンクの要素には、例外オブジェクトが格納されます。
+    """
+    translated = [""] * len(text_chunks) # 空のチャンクは翻訳せず空文字とする
+    chunk_indices, duplicate_of = _collect_uncached_chunks(text_chunks, model_name, translated)
+    if google_genai is None:
+        print("警告: google-genai がインストールされていないため、Batch API を使用できません。通常の翻訳処理を行います。")
+        return translate_text_chunks(text_chunks, model_name, max_retries, initial_delay, **kwargs)
+    if len(chunk_indices) < min_batch_chunks:
+        print(f"情報: チャンク数 ({len(chunk_indices)}) が少ないため、Batch API を使用せず通常の翻訳処理を行います。")
+        return translate_text_chunks(text_chunks, model_name, max_retries, initial_delay, **kwargs)
+
+    print(f"{len(chunk_indices)} 個のチャンクを Batch API で翻訳します...")
+    try:
+        client = google_genai.Client(api_key=google_api_key)
+        use_file = sum(len(text_chunks[i].encode('utf-8')) for i in chunk_indices) > _BATCH_INLINE_MAX_BYTES
+        if use_file:
+            batch_job = _create_file_batch_job(client, model_name, text_chunks, chunk_indices)
+        else:
+            batch_job = _create_inline_batch_job(client, model_name, text_chunks, chunk_indices)
+        print(f"バッチジョブを作成しました。ジョブ名: {batch_job.name}")
+
+        # ジョブが終了するまで、待機時間を徐々に延ばしながらポーリング
+        current_interval = poll_interval
+        while batch_job.state.name not in _BATCH_JOB_COMPLETED_STATES:
+            print(f"  バッチジョブの状態: {batch_job.state.name}。{current_interval}秒後に再確認します...")
+            time.sleep(current_interval)
+            current_interval = min(current_interval * 2, max_poll_interval)
+            batch_job = client.batches.get(name=batch_job.name)
+    except Exception as e:
+        print(f"警告: Batch API の呼び出し中にエラーが発生しました: {e}。通常の翻訳処理にフォールバックします。")
+        return translate_text_chunks(text_chunks, model_name, max_retries, initial_delay, **kwargs)
+
+    if batch_job.state.name != "JOB_STATE_SUCCEEDED":
+        print(f"警告: バッチジョブが正常に終了しませんでした (状態: {batch_job.state.name}, エラー: {batch_job.error})。通常の翻訳処理にフォールバックします。")
+        return translate_text_chunks(text_chunks, model_name, max_retries, initial_delay, **kwargs)
+
+    # 結果を custom_id / key (なければリクエスト順) に基づいて元のチャンク順に対応付ける
+    for chunk_index in chunk_indices:
+        translated[chunk_index] = RuntimeError("バッチジョブの結果にこのチャンクの応答が含まれていません。")
+    if use_file:
+        try:
+            _read_file_batch_results(client, batch_job, translated, text_chunks, model_name)
+        except Exception as e:
+            print(f"警告: バッチジョブの結果ファイルの取得中にエラーが発生しました: {e}。通常の翻訳処理にフォールバックします。")
+            return translate_text_chunks(text_chunks, model_name, max_retries, initial_delay, **kwargs)
+    else:
+        _read_inline_batch_results(batch_job, chunk_indices, translated, text_chunks, model_name)
+    _fill_duplicate_chunks(translated, duplicate_of)
+    print("Batch API による翻訳が完了しました。")
+    return translated
+
+def _find_drive_file(drive_service, query):
+    """!
+    @brief Google Drive 上でクエリに一致するファイルを検索し、最初に見つかったファイルのIDを返します。
+    @param drive_service (googleapiclient.discovery.Resource): Google Drive APIサービスオブジェクト。
+    @param query (str): Drive API のファイル検索クエリ。
+    @return str | None: 見つかったファイルのID。見つからない場合はNone。
+    """
+    files = drive_service.files().list(q=query, fields='files(id)', pageSize=1).execute().get('files', [])
+    return files[0]['id'] if files else None
+
+def _generate_doc_insert_requests(chapter_titles, translated_chunks, chapter_levels):
+    """!
+    @brief 章ごとの Docs API insertText リクエストを順に生成します。
+           章タイトルには階層レベルに応じたMarkdown風の見出し (#, ##, ...) を付け、
+           章の区切りとしてMarkdownの水平線を追加します。
+    @param chapter_titles (list[str]): 各章のタイトルリスト。
+    @param translated_chunks (list[str]): 各章に対応する翻訳済みテキストのリスト。
+    @param chapter_levels (list[int]): 各章のブックマーク階層レベル (0始まり) のリスト。
+    @return generator[dict]: batchUpdate の requests に渡す insertText リクエスト。
+    """
+    # chapter_titles, translated_chunks, chapter_levels の長さが同じであることを前提とする
+    # (main.py でそのように処理されているはず)
+    for chap_title, translated_text, level in zip(chapter_titles, translated_chunks, chapter_levels):
+        # レベル0なら"#", レベル1なら"##", ... (想定外に深い階層の場合のみ都度生成する)
+        header_prefix = _HEADER_PREFIXES[level] if level < len(_HEADER_PREFIXES) else "#" * (level + 1)
+        yield {
+            'insertText': {
+                # 本文の末尾に追記する (挿入位置のインデックスを自前で計算する必要がない)
+                'endOfSegmentLocation': {},
+                'text': f"{header_prefix} {chap_title}\n\n{translated_text}\n\n---\n\n"
+            }
+        }
+
 def save_to_google_doc(docs_service, drive_service, title, chapter_titles,
-                       translated_chunks, chapter_levels, max_retries=2, initial_delay=5):
+                       translated_chunks, chapter_levels, max_retries=3, initial_delay=1):
     """!
     @brief 翻訳されたテキストチャンクを章ごとに結合し、新しいGoogleドキュメントに保存します。
            章タイトルには階層レベルに応じたMarkdown風の見出し (#, ##, ...) を付けます。
@@ -179,22 +843,33 @@ def save_to_google_doc(docs_service, drive_service, title, chapter_titles,
     @param translated_chunks (list[str]): 各章に対応する翻訳済みテキストのリスト。
     @param chapter_levels (list[int]): 各章のブックマーク階層レベル (0始まり) のリスト。
     @param max_retries (int): 最大リトライ回数。
-    @param initial_delay (float): 初回のリトライ待機時間（秒）。
-    @return None
+    @param initial_delay (float): リトライ待機時間の基準値（秒）。
+    @return bool: 保存に成功した場合は True、スキップまたは失敗した場合は False。
     """
     if not docs_service or not drive_service:
         print("エラー: Google APIサービスが利用できません。保存をスキップします。")
-        return
+        return False
 
     print(f"翻訳結果を新しいGoogleドキュメント '{title}' に保存中...")
     try:
         # 1. 新しいGoogleドキュメントを作成 (Drive APIを使用)
+        #    作成操作ごとのIDを appProperties に設定しておき、リトライ時はまずそのIDでファイルを検索する
+        #    (前回の試行がサーバー側では成功していて応答だけが失われた場合に、ドキュメントを重複して作成しない)
+        operation_id = uuid.uuid4().hex
+        create_attempted = False
         # --- リトライデコレータを適用した内部関数 ---
-        @retry_api_call(max_retries=max_retries, initial_delay=initial_delay)
+        @retry_api_call(max_retries=max_retries, initial_delay=initial_delay, rate_controller=_workspace_rate_controller)
         def _create_doc_with_retry():
+            nonlocal create_attempted
+            if create_attempted:
+                existing_id = _find_drive_file(drive_service, f"appProperties has {{ key='{_OPERATION_ID_PROPERTY}' and value='{operation_id}' }} and trashed = false")
+                if existing_id:
+                    return {'id': existing_id}
+            create_attempted = True
             body = {
                 'name': title,
-                'mimeType': 'application/vnd.google-apps.document'
+                'mimeType': 'application/vnd.google-apps.document',
+                'appProperties': {_OPERATION_ID_PROPERTY: operation_id},
             }
             return drive_service.files().create(body=body).execute()
         # --- 内部関数ここまで ---
@@ -205,72 +880,65 @@ def save_to_google_doc(docs_service, drive_service, title, chapter_titles,
         print(f"新しいGoogleドキュメントを作成しました。ID: {document_id}")
         print(f"ドキュメントURL: https://docs.google.com/document/d/{document_id}/edit")
 
-        # 2. 章タイトルと翻訳されたテキストを交互に結合
-        #    階層レベルに応じてタイトルの見出しレベル (# の数) を変更
-        content_to_insert = []
-        # chapter_titles, translated_chunks, chapter_levels の長さが同じであることを前提とする
-        # (main.py でそのように処理されているはず)
-        for chap_title, translated_text, level in zip(chapter_titles, translated_chunks, chapter_levels):
-            header_prefix = "#" * (level + 1) # レベル0なら"#", レベル1なら"##", ...
-            content_to_insert.append(f"{header_prefix} {chap_title}\n\n") # 階層に応じた見出し
-            content_to_insert.append(f"{translated_text}\n\n")
-            # 章の区切りとしてMarkdownの水平線を追加
-            content_to_insert.append("---\n\n")
-
-        full_content = "".join(content_to_insert)
-
-        # 3. 結合したテキストをドキュメントに挿入 (Docs APIを使用)
-        # --- リトライデコレータを適用した内部関数 ---
-        @retry_api_call(max_retries=max_retries, initial_delay=initial_delay)
-        def _batch_update_with_retry():
-            requests = [
-                {
-                    'insertText': {
-                        'location': {
-                            'index': 1, # ドキュメントの先頭
-                        },
-                        'text': full_content
-                    }
-                }
-            ]
-            return docs_service.documents().batchUpdate(documentId=document_id, body={'requests': requests}).execute()
-        # --- 内部関数ここまで ---
-
-        _batch_update_with_retry()
+        # 2. 章ごとの挿入リクエストを1回の batchUpdate にまとめてドキュメントに挿入 (Docs APIを使用)
+        #    全章を1つの巨大な文字列に結合せず、章ごとに insertText リクエストを分けることで
+        #    1リクエストあたりのテキストサイズを抑える (batchUpdate はサーバー側でまとめて適用される)
+        requests = list(_generate_doc_insert_requests(chapter_titles, translated_chunks, chapter_levels))
+        # 作成直後のリビジョンを指定して更新することで、リトライ時に同じ内容が二重に挿入されるのを防ぐ
+        # (前回の試行が適用済みであればリビジョンが一致せず、リトライはエラーとなる)
+        revision_id = docs_service.documents().get(documentId=document_id, fields='revisionId').execute(num_retries=max_retries)['revisionId']
+        body = {'requests': requests, 'writeControl': {'requiredRevisionId': revision_id}}
+        # googleapiclient 組み込みのリトライ (429/5xx に対する指数バックオフ) を使用
+        docs_service.documents().batchUpdate(documentId=document_id, body=body).execute(num_retries=max_retries)
 
         print("Googleドキュメントへの保存完了。")
+        return True
 
     except Exception as e: # googleapiclient.errors.HttpError など、より具体的なエラーを捕捉することも検討
         print(f"エラー: Googleドキュメントへの保存中にエラーが発生しました。 {e}")
         # リトライデコレータが最終的なエラーを送出する
         if hasattr(e, 'content'):
             print(f"APIエラー詳細: {e.content}")
+        return False
 
-def save_to_google_sheet(gspread_client, drive_service, title, chapter_titles,
-                         original_texts, translated_chunks, max_retries=2, initial_delay=5):
+def save_to_google_sheet(gspread_client, sheets_service, drive_service, title, rows,
+                         max_retries=3, initial_delay=1):
     """!
     @brief 翻訳結果を新しいGoogleスプレッドシートに保存します。
            'タイトル', '原文', '訳文' の3列で出力します。
+           ヘッダー行とデータ行は Sheets API の values.update で A1 から1回のリクエストにまとめて書き込みます。
     @param gspread_client (gspread.Client): 認証済みのgspreadクライアント。
-    @param drive_service (googleapiclient.discovery.Resource): Google Drive APIサービスオブジェクト (パーミッション設定等に将来的に使用する可能性)。
+    @param sheets_service (googleapiclient.discovery.Resource): Google Sheets APIサービスオブジェクト。
+    @param drive_service (googleapiclient.discovery.Resource): Google Drive APIサービスオブジェクト (作成済みスプレッドシートの検索に使用)。
+           ドキュメントの保存と並行して呼び出す場合は、ドキュメント用とは別の HTTP クライアントで構築したものを渡すこと。
     @param title (str): 作成するGoogleスプレッドシートのタイトル。
-    @param chapter_titles (list[str]): 各章のタイトルリスト。
-    @param original_texts (list[str]): 各章に対応する原文テキストのリスト。
-    @param translated_chunks (list[str]): 各章に対応する翻訳済みテキストのリスト。
+    @param rows (list[list[str]]): 各章の [タイトル, 原文, 訳文] を並べた2次元リスト (ヘッダー行は含まない)。
     @param max_retries (int): 最大リトライ回数。
-    @param initial_delay (float): 初回のリトライ待機時間（秒）。
-    @return None
+    @param initial_delay (float): リトライ待機時間の基準値（秒）。
+    @return bool: 保存に成功した場合は True、スキップまたは失敗した場合は False。
     """
-    if not gspread_client:
+    if not gspread_client or not sheets_service:
         print("エラー: Google Sheets APIクライアントが利用できません。保存をスキップします。")
-        return
+        return False
 
     print(f"翻訳結果を新しいGoogleスプレッドシート '{title}' に保存中...")
     try:
         # 1. 新しいスプレッドシートを作成
+        #    リトライ時は、前回の試行で作成済みのスプレッドシートがないか、タイトルと作成日時で検索する
+        #    (前回の試行がサーバー側では成功していて応答だけが失われた場合に、重複して作成しない)
+        #    時刻のずれを考慮し、検索対象の作成日時には余裕を持たせる
+        created_after = (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(minutes=1)).strftime('%Y-%m-%dT%H:%M:%S')
+        escaped_title = title.replace("\\", "\\\\").replace("'", "\\'")
+        create_attempted = False
         # --- リトライデコレータを適用した内部関数 ---
-        @retry_api_call(max_retries=max_retries, initial_delay=initial_delay)
+        @retry_api_call(max_retries=max_retries, initial_delay=initial_delay, rate_controller=_workspace_rate_controller)
         def _create_sheet_with_retry():
+            nonlocal create_attempted
+            if create_attempted and drive_service:
+                existing_id = _find_drive_file(drive_service, f"name = '{escaped_title}' and mimeType = 'application/vnd.google-apps.spreadsheet' and createdTime > '{created_after}' and trashed = false")
+                if existing_id:
+                    return gspread_client.open_by_key(existing_id)
+            create_attempted = True
             return gspread_client.create(title)
         # --- 内部関数ここまで ---
 
@@ -279,28 +947,29 @@ def save_to_google_sheet(gspread_client, drive_service, title, chapter_titles,
 
         print(f"スプレッドシートURL: {spreadsheet.url}")
 
-        # 2. 最初のワークシートを取得
-        worksheet = spreadsheet.get_worksheet(0) # 最初のシート
-
-        # 3. ヘッダー行を作成
+        # 2. ヘッダー行を付けて書き込む値を準備
+        #    行ごと・セルごとに書き込むとリクエスト数が行数×列数に比例するため、全体を1つの2次元リストにまとめる
         header = ["タイトル", "原文", "訳文"]
-        # ヘッダー追加はリトライ不要と判断する場合が多いが、念のため含めることも可能
-        # @retry_api_call(max_retries=max_retries, initial_delay=initial_delay)
-        # def _append_header():
-        #     worksheet.append_row(header, value_input_option='USER_ENTERED')
-        # _append_header()
-        worksheet.append_row(header, value_input_option='USER_ENTERED') # ヘッダー追加はリトライ対象外とする
-
-        # 4. データを準備して一括書き込み (効率的)
+        values = [header, *rows]
+
+        # 3. ヘッダー行とデータ行を1回のリクエストで書き込み
+        #    RAW を指定し、セルの値を数式や日付として解釈させない (サーバー側の解析処理を省く)
+        #    範囲にシート名を含めない場合は最初のシートが対象になる (シート名はアカウントの言語設定によって異なる)
+        #    追記 (append) ではなく A1 からの上書き (update) とし、リトライしても行が重複しないようにする
         # --- リトライデコレータを適用した内部関数 ---
-        @retry_api_call(max_retries=max_retries, initial_delay=initial_delay)
+        @retry_api_call(max_retries=max_retries, initial_delay=initial_delay, rate_controller=_workspace_rate_controller)
         def _append_rows_with_retry():
-            rows_to_insert = [list(row) for row in zip(chapter_titles, original_texts, translated_chunks)]
-            return worksheet.append_rows(rows_to_insert, value_input_option='USER_ENTERED')
+            return sheets_service.spreadsheets().values().update(
+                spreadsheetId=spreadsheet.id,
+                range=f'A1:C{len(values)}',
+                valueInputOption='RAW',
+                body={'values': values},
+            ).execute()
         # --- 内部関数ここまで ---
         _append_rows_with_retry()
 
         print("Googleスプレッドシートへの保存完了。")
+        return True
     except Exception as e:
         # より詳細なエラー情報を表示
         print(f"エラー: Googleスプレッドシートへの保存中に予期せぬエラーが発生しました。")
@@ -310,3 +979,4 @@ def save_to_google_sheet(gspread_client, drive_service, title, chapter_titles,
         # APIエラーの詳細を表示する場合 (属性が存在するか確認した方がより安全)
         if hasattr(e, 'content'):
             print(f"APIエラー詳細: {e.content}")
+        return False
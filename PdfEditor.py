@@ -1,8 +1,55 @@
 import PyPDF2
 import PyPDF2.errors # PyPDF2のエラーをインポート
 import os
-from collections import OrderedDict # 順序付き辞書を使うためにインポート
+import re
+import contextlib
+import functools
+import itertools
+import mmap
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 from tqdm import tqdm # tqdmライブラリをインポート
+try:
+    import pypdfium2 as pdfium # 高速なページテキスト抽出用の PDFium バックエンド (任意)
+except ImportError:
+    pdfium = None
+
+# ページテキスト抽出のワーカープロセスの起動方式
+# 章分割は認証処理などと並行して別スレッドから呼び出されるため、マルチスレッドのプロセスを fork しない方式を使う
+# (fork では他のスレッドが保持していたロックがワーカー側で解放されず、デッドロックする可能性がある)
+# forkserver が使えない環境 (Windows) では spawn を使う
+_EXTRACTION_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# ページテキスト抽出に使用するワーカープロセス数の上限
+_MAX_EXTRACTION_WORKERS = 8
+
+# この数より少ないページはワーカープロセスを使わずに抽出する (プロセス起動のコストの方が大きいため)
+_MIN_PAGES_FOR_PARALLEL_EXTRACTION = 16
+
+# ワーカープロセスに1回のタスクとして渡すページ数
+_PAGES_PER_TASK = 4
+
+# 結果を受け取る前に投入しておくページ数の上限 (巨大なPDFで全ページ分のタスクを一度に投入しないようにする)
+_MAX_PENDING_PAGES = 32
+
+# ワーカープロセスごとに開いたPDFドキュメント (PDFのオブジェクトはプロセス間で受け渡しできないため)
+_worker_document = None
+
+@contextlib.contextmanager
+def _open_pdf_reader(pdf_path):
+    """PDFファイルを読み取り専用でメモリマップし、その上で PyPDF2.PdfReader を開きます。
+
+    PyPDF2 はファイルに対して小さな seek/read を大量に行うため、メモリマップ上で読み込むことで
+    システムコールの回数を減らします。
+
+    Args:
+        pdf_path: 開くPDFファイルのパス。
+
+    Yields:
+        PyPDF2.PdfReader。with ブロックを抜けるとメモリマップとファイルは閉じられます。
+    """
+    with open(pdf_path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        yield PyPDF2.PdfReader(mapped, strict=False)
 
 def extract_text_from_pdf(pdf_path):
     """PDFファイルから全ページのテキストを抽出して結合します。
@@ -21,7 +68,6 @@ def extract_text_from_pdf(pdf_path):
         PyPDF2.errors.PdfReadError: PDFファイルの読み込みに失敗した場合。
     """
     print(f"'{pdf_path}' からテキストを抽出中...")
-    full_text = ""
     try:
         # ファイルが存在するか確認
         if not os.path.exists(pdf_path):
@@ -32,18 +78,11 @@ def extract_text_from_pdf(pdf_path):
             print(f"エラー: 指定されたファイルはPDFファイルではない可能性があります - {pdf_path}")
             return None
 
-        with open(pdf_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
+        with _open_pdf_reader(pdf_path) as reader:
             num_pages = len(reader.pages)
-            print(f"ページ数: {num_pages}")
-            # tqdmを使ってページごとの読み込み進捗を表示
-            for page_num in tqdm(range(num_pages), desc="PDF読み込み", unit="ページ"):
-                page = reader.pages[page_num]
-                page_text = page.extract_text()
-                if page_text: # テキストが抽出できた場合のみ追加
-                    full_text += page_text
-                # else:
-                #     print(f"デバッグ: ページ {page_num + 1} からテキストを抽出できませんでした。")
+        print(f"ページ数: {num_pages}")
+        # ページの抽出は split_text_by_bookmarks と同じく、ワーカープロセスで並列に行う
+        full_text = _extract_full_text(pdf_path, num_pages)
 
     except FileNotFoundError: # このブロックは通常 os.path.exists で捕捉されるはずだが、念のため残す
         print(f"エラー: PDFファイル '{pdf_path}' が見つかりません。")
@@ -62,6 +101,45 @@ def extract_text_from_pdf(pdf_path):
     print(f"PDFからのテキスト抽出完了。総文字数: {len(full_text)}")
     return full_text
 
+@functools.lru_cache(maxsize=512)
+def _compile_whitespace_insensitive_pattern(needle):
+    """needle の各文字の間に任意の空白を許容する正規表現パターンを作成します。
+
+    各章のタイトルは開始マーカーと (前の章の) 終了マーカーとして2回検索されるため、作成したパターンはキャッシュします。
+    """
+    return re.compile(r"\s*".join(re.escape(c) for c in re.sub(r"\s+", "", needle)))
+
+def _search_ignoring_whitespace(haystack, needle, start_offset=0):
+    """
+    haystack内でneedleを検索します。haystackとneedleの両方の空白文字は無視されます。
+    見つかった場合は re.Match を返します (start()/end() は haystack における元のインデックス)。見つからない場合はNoneを返します。
+    空のneedleは start_offset で一致し、空白のみのneedleは見つからないものとして扱います。
+    """
+    if needle.isspace(): return None
+    return _compile_whitespace_insensitive_pattern(needle).search(haystack, start_offset)
+
+def _find_ignoring_whitespace(haystack, needle, start_offset=0):
+    """
+    haystack内でneedleを検索します。haystackとneedleの両方の空白文字は無視されます。
+    見つかった場合、haystackにおける開始インデックス（空白無視前の元のインデックス）を返します。見つからない場合は-1を返します。
+    """
+    match = _search_ignoring_whitespace(haystack, needle, start_offset)
+    return match.start() if match else -1
+
+def _slice_stripped(text, start, end=None):
+    """text[start:end] の前後の空白を除いた部分文字列を返します。
+
+    text[start:end].strip() と同じ結果ですが、空白を除く範囲を先に求めてから一度だけスライスするため、
+    長い章テキストの中間コピーを作成しません。
+    """
+    if end is None:
+        end = len(text)
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return text[start:end]
+
 # --- Helper function for apostrophe normalization ---
 def _normalize_apostrophes(text: str) -> str:
     """
@@ -84,6 +162,95 @@ def _normalize_apostrophes(text: str) -> str:
     for old, new in replacements_dict.items():
         text = text.replace(old, new)
     return text
+def _open_text_document(pdf_path):
+    """ページテキストの抽出に使用するPDFドキュメントを開きます。
+
+    pypdfium2 がインストールされている場合は PDFium (高速かつ高精度) を、
+    それ以外の場合は PyPDF2 を使用します。ブックマークの解析には引き続き PyPDF2 を使用します。
+    """
+    if pdfium is not None:
+        return pdfium.PdfDocument(pdf_path)
+    return PyPDF2.PdfReader(pdf_path, strict=False)
+
+def _read_page_text(document, page_num):
+    """`_open_text_document` で開いたドキュメントから1ページ分のテキストを抽出します。
+
+    Returns:
+        抽出したテキスト。テキストが抽出できなかった場合は空文字列。
+    """
+    if pdfium is not None:
+        page = document[page_num]
+        textpage = page.get_textpage()
+        try:
+            # PDFium は改行を CRLF で返し、ページ末尾に改行を付けないため、PyPDF2 の出力形式に揃える
+            # (ページを結合したときに、前のページの最終行と次のページの先頭行がつながらないようにする)
+            text = textpage.get_text_range().replace("\r\n", "\n")
+            return text + "\n" if text and not text.endswith("\n") else text
+        finally:
+            textpage.close()
+            page.close()
+    return document.pages[page_num].extract_text() or ""
+
+def _init_page_worker(pdf_path):
+    """ワーカープロセスの初期化処理。PDFファイルを開き、プロセス内で使い回すドキュメントを作成します。"""
+    global _worker_document
+    _worker_document = _open_text_document(pdf_path)
+
+def _extract_page_batch(page_nums):
+    """ワーカープロセスで複数ページのテキストを抽出します。
+
+    Returns:
+        (ページ番号, 抽出したテキスト) のタプルのリスト。テキストが抽出できなかったページは空文字列。
+    """
+    return [(page_num, _read_page_text(_worker_document, page_num)) for page_num in page_nums]
+
+def _extract_page_texts(pdf_path, page_nums):
+    """指定されたページのテキストを、複数のプロセスで並列に抽出します。
+
+    各ページのテキストは一度だけ抽出されるため、隣り合う章で共有される境界のページも
+    重複して抽出されることはありません。ページ数が少ない場合は現在のプロセスで順に抽出します。
+
+    Args:
+        pdf_path: 処理対象のPDFファイルのパス。
+        page_nums: テキストを抽出するページ番号 (0始まり) のリスト。
+
+    Returns:
+        キーがページ番号、値がそのページのテキストの辞書。
+    """
+    if not page_nums:
+        return {}
+    if len(page_nums) < _MIN_PAGES_FOR_PARALLEL_EXTRACTION:
+        document = _open_text_document(pdf_path)
+        try:
+            return {page_num: _read_page_text(document, page_num) for page_num in page_nums}
+        finally:
+            if pdfium is not None:
+                document.close()
+    max_workers = min(os.cpu_count() or 1, _MAX_EXTRACTION_WORKERS, len(page_nums))
+    print(f"{len(page_nums)} ページのテキストを {max_workers} 個のプロセスで抽出中...")
+    batches = iter([page_nums[i:i + _PAGES_PER_TASK] for i in range(0, len(page_nums), _PAGES_PER_TASK)])
+    max_pending_tasks = max(max_workers, _MAX_PENDING_PAGES // _PAGES_PER_TASK)
+    page_texts = {}
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(_EXTRACTION_START_METHOD),
+                             initializer=_init_page_worker, initargs=(pdf_path,)) as executor, \
+            tqdm(total=len(page_nums), desc="PDF読み込み", unit="ページ",
+                 miniters=max(1, len(page_nums) // 100), mininterval=0.2, smoothing=0.3) as progress:
+        # 処理待ちのタスクが上限を超えないよう、完了したタスクの数だけ次のタスクを投入する
+        pending = {executor.submit(_extract_page_batch, batch) for batch in itertools.islice(batches, max_pending_tasks)}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results = future.result()
+                page_texts.update(results)
+                progress.update(len(results))
+            pending.update(executor.submit(_extract_page_batch, batch) for batch in itertools.islice(batches, len(done)))
+    return page_texts
+
+def _extract_full_text(pdf_path, num_pages):
+    """PDFの全ページのテキストを `_extract_page_texts` で抽出し、ページ順に結合して返します。"""
+    page_texts = _extract_page_texts(pdf_path, list(range(num_pages)))
+    return "".join(page_texts[page_num] for page_num in range(num_pages))
+
 # --- 新しい関数: ブックマークに基づいてテキストを分割 ---
 def split_text_by_bookmarks(pdf_path):
     """PDFのブックマーク（アウトライン）に基づきテキストを分割します。
@@ -96,12 +263,12 @@ def split_text_by_bookmarks(pdf_path):
 
     Returns:
         キーが章（ブックマーク）タイトル、値が {"text": 章のテキスト, "level": 階層レベル (0始まり)}
-        の `collections.OrderedDict`。
+        の辞書 (章の順序を保持)。
         ブックマークが存在しない場合やエラー発生時はNoneを返します。
 
     """
     print(f"'{pdf_path}' のブックマーク（アウトライン）に基づいてテキストを分割中...")
-    chapters = OrderedDict() # 章のタイトルとテキストを格納 (順序維持)
+    chapters = {} # 章のタイトルとテキストを格納 (dict は挿入順を保持する)
 
     try:
         # ファイルが存在するか確認
@@ -113,42 +280,37 @@ def split_text_by_bookmarks(pdf_path):
             print(f"エラー: 指定されたファイルはPDFファイルではない可能性があります - {pdf_path}")
             return None
 
-        with open(pdf_path, 'rb') as file:
-            reader = PyPDF2.PdfReader(file)
+        with _open_pdf_reader(pdf_path) as reader:
+            num_pages = len(reader.pages) # PDFの総ページ数 (ループ内で何度も参照するため一度だけ取得)
             bookmarks = reader.outline
 
-            if not bookmarks:
-                print("警告: このPDFにはブックマーク（目次）が見つかりませんでした。章分割はできません。")
-                # ブックマークがない場合は、全テキストを一つの章として返すフォールバック処理
-                full_text = "" # ここで全テキスト抽出を試みる
-                for page_num in range(len(reader.pages)):
-                    page = reader.pages[page_num]
-                    page_text = page.extract_text()
-                    if page_text:
-                        full_text += page_text
-                if full_text:
-                    # ブックマークがない場合、タイトルを固定文字列にし、レベルを0とする
-                    chapters["Full Text (No Bookmarks)"] = {"text": full_text, "level": 0}
-                    return chapters # 単一要素の辞書を返す
-                else:
-                    print("警告: ブックマークがなく、テキストも抽出できませんでした。")
-                    return None # テキストもなければNoneを返す
+            get_destination_page_number = reader.get_destination_page_number
+            # ブックマーク情報を収集する内部関数
+            def _get_bookmarks(outline_items):
+                """ブックマークリストを明示的なスタックで深さ優先に探索し、情報を収集する。
 
-            # 再帰的にブックマーク情報を収集する内部関数
-            def _get_bookmarks(outline_items, level=0):
-                """ブックマークリストを再帰的に探索し、情報を収集する。"""
-                for item in outline_items:
+                目次の階層が深いPDFでも再帰呼び出しの上限に達しないよう、再帰ではなく
+                (イテレータ, 階層レベル) のスタックで探索する。
+                """
+                stack = [(iter(outline_items), 0)]
+                while stack:
+                    items, level = stack[-1]
+                    item = next(items, None)
+                    if item is None:
+                        # この階層のブックマークを全て処理したので、親の階層に戻る
+                        stack.pop()
+                        continue
                     # PyPDF2のoutlineはリストとDestinationオブジェクトの混合リスト
-                    # リストの場合は、それがサブブックマークのリストなので再帰呼び出し
+                    # リストの場合は、それがサブブックマークのリストなのでスタックに積んで先に処理する
                     # Destinationオブジェクトの場合は、それがブックマーク本体
                     # (参考: https://pypdf2.readthedocs.io/en/latest/user/bookmarks.html)
                     if isinstance(item, list):
-                        # サブブックマークを再帰的に処理
-                        _get_bookmarks(item, level + 1)
+                        # サブブックマークを一つ深い階層として処理
+                        stack.append((iter(item), level + 1))
                     else:
                         # ブックマークアイテム
                         try:
-                            page_index = reader.get_destination_page_number(item)
+                            page_index = get_destination_page_number(item)
                             # ページ番号が取得できないブックマークはスキップ
                             if page_index is not None: # ページ番号が取得できた場合のみ追加
                                 # (タイトル, 開始ページインデックス, 階層レベル) のタプルをリストに追加
@@ -159,98 +321,72 @@ def split_text_by_bookmarks(pdf_path):
                             print(f"警告: ブックマーク '{item.title}' のページ番号取得に失敗しました。スキップします。 {e}")
 
             all_bookmarks_info = [] # (title, page_index, level) のタプルを格納するリスト
-            _get_bookmarks(bookmarks) # ブックマーク情報収集の開始
+            if bookmarks:
+                _get_bookmarks(bookmarks) # ブックマーク情報収集の開始
+                if not all_bookmarks_info:
+                    print("警告: 有効なブックマーク情報が見つかりませんでした。章分割はできません。")
+            else:
+                print("警告: このPDFにはブックマーク（目次）が見つかりませんでした。章分割はできません。")
 
             if not all_bookmarks_info:
-                print("警告: 有効なブックマーク情報が見つかりませんでした。")
-                return None # 有効なブックマークがなければNoneを返す
+                # ブックマークがない (または有効なものがない) 場合は、全テキストを一つの章として返すフォールバック処理
+                # ページの抽出は章ごとの処理と同じ _extract_page_texts で行う
+                full_text = _extract_full_text(pdf_path, num_pages)
+                if full_text:
+                    # ブックマークがない場合、タイトルを固定文字列にし、レベルを0とする
+                    chapters["Full Text (No Bookmarks)"] = {"text": full_text, "level": 0}
+                    return chapters # 単一要素の辞書を返す
+                else:
+                    print("警告: ブックマークがなく、テキストも抽出できませんでした。")
+                    return None # テキストもなければNoneを返す
 
             # 収集した全てのブックマーク情報を、ページ番号を基準に昇順でソートする
             sorted_all_bookmarks_info = sorted(all_bookmarks_info, key=lambda item: item[1])
 
-            # --- extract_text_between_markers のロジックで使用するヘルパー関数をここに移動 ---
-            def _find_ignoring_whitespace(haystack, needle, start_offset=0):
-                """
-                haystack内でneedleを検索します。haystackとneedleの両方の空白文字は無視されます。
-                見つかった場合、haystackにおける開始インデックス（空白無視前の元のインデックス）を返します。見つからない場合は-1を返します。
-                """
-                if not needle: return start_offset
-
-                h_len, n_len = len(haystack), len(needle)
-                h_idx, n_idx = start_offset, 0
-                potential_start = -1
-
-                while h_idx < h_len:
-                    # haystackの空白をスキップ
-                    while h_idx < h_len and haystack[h_idx].isspace():
-                        h_idx += 1
-                    if h_idx == h_len: break
-
-                    # needleの空白をスキップ
-                    while n_idx < n_len and needle[n_idx].isspace(): n_idx += 1
-                    if n_idx == n_len: return potential_start
-
-                    # 非空白文字を比較
-                    if h_idx < h_len and n_idx < n_len and haystack[h_idx] == needle[n_idx]:
-                        if n_idx == 0: potential_start = h_idx # マッチ開始位置を記録
-                        n_idx += 1
-                    else: # ミスマッチ
-                        if potential_start != -1:
-                            h_idx = potential_start # マッチ途中だった場合、検索開始位置を戻す
-                            potential_start = -1
-                        n_idx = 0
-                    h_idx += 1
-
-                # ループ終了後、needleの残りが空白のみかチェック
-                while n_idx < n_len and needle[n_idx].isspace(): n_idx += 1
-                if n_idx == n_len: return potential_start # マッチ成功
-                return -1 # 見つからなかった
-            # --- ヘルパー関数ここまで ---
+            # タイトル・開始ページ・階層レベルを、それぞれ章の順に並んだ個別のリストとして保持する
+            titles, start_pages, levels = (list(column) for column in zip(*sorted_all_bookmarks_info))
+
+            # 各章のページ範囲を求める
+            # 次のブックマークの開始ページを、現在の章の終了ページとする
+            # 最後のブックマークの場合は、PDFの最終ページまでを範囲とする
+            end_pages = start_pages[1:] + [num_pages]
+            # ページ抽出の際の上限ページ番号（このページ番号自体はrangeに含まない）を設定します。
+            # 現在の章のテキストとして、次のブックマークの開始ページ(end_page)の内容まで含めて抽出します。
+            # end_page は次のブックマークの開始ページインデックス、または num_pages です。
+            # 上限ページ番号は end_page + 1 となりますが、num_pages を超えないようにします。
+            #
+            # 例:
+            # 1. 次のブックマークがページP (インデックス) にある場合:
+            #    end_page = P
+            #    上限ページ番号 = min(P + 1, num_pages)
+            #    range(start_page, P + 1) -> page_num は start_page ... P
+            # 2. これが最後のブックマークの場合:
+            #    end_page = num_pages
+            #    上限ページ番号 = min(num_pages + 1, num_pages) = num_pages
+            #    range(start_page, num_pages) -> page_num は start_page ... num_pages - 1
+            # 開始ページがPDFの範囲外の章は None とする
+            chapter_page_ranges = [range(start_page, min(end_page + 1, num_pages)) if 0 <= start_page < num_pages else None
+                                   for start_page, end_page in zip(start_pages, end_pages)]
+
+            # 全ての章で必要になるページのテキストを、まとめて一度だけ抽出する
+            needed_pages = sorted({page_num for page_range in chapter_page_ranges if page_range for page_num in page_range})
+            page_texts = _extract_page_texts(pdf_path, needed_pages)
+
+            # マーカー絞り込みに使用するタイトルを事前に正規化しておく
+            # (各タイトルは、その章の開始マーカーと前の章の終了マーカーとして2回使用される)
+            normalized_titles = [_normalize_apostrophes(title) for title in titles]
 
             # ソートされたブックマーク情報に基づき、各章のテキストを抽出
-            for i, (title, start_page, level) in enumerate(sorted_all_bookmarks_info):
-                # 次のブックマークの開始ページを、現在の章の終了ページとする
-                # 最後のブックマークの場合は、PDFの最終ページまでを範囲とする
-                next_title = "" # 次の章のタイトル（マーカー絞り込み用）
-                if i + 1 < len(sorted_all_bookmarks_info):
-                    end_page = sorted_all_bookmarks_info[i+1][1] # 次の章の開始ページ
-                    next_title = sorted_all_bookmarks_info[i+1][0]
-                else:
-                    end_page = len(reader.pages) # PDFの総ページ数
-                chapter_text = ""
+            for i, (title, start_page, level) in enumerate(zip(titles, start_pages, levels)):
+                next_title = titles[i+1] if i + 1 < len(titles) else "" # 次の章のタイトル（マーカー絞り込み用）
 
-                # 1. start_page の妥当性チェック
-                if not (0 <= start_page < len(reader.pages)):
+                page_range = chapter_page_ranges[i]
+                if page_range is None: # start_page の妥当性チェック
                     print(f"警告: ブックマーク '{title}' が指す開始ページ {start_page} はPDFの有効範囲外です。この章のテキストは空になります。")
-                    # chapter_text は "" のまま
+                    chapter_text = ""
                 else:
-                    # ページ抽出の際の上限ページ番号（このページ番号自体はrangeに含まない）を設定します。
-                    # 現在の章のテキストとして、次のブックマークの開始ページ(end_page)の内容まで含めて抽出します。
-                    # end_page は次のブックマークの開始ページインデックス、または len(reader.pages) です。
-                    # ループで page_num が start_page から end_page (またはPDF最終ページ) まで動くように、
-                    # range の第二引数は page_extraction_upper_bound とします。
-                    # page_extraction_upper_bound は end_page + 1 となりますが、len(reader.pages) を超えないようにします。
-                    page_extraction_upper_bound = min(end_page + 1, len(reader.pages))
-
-                    # 例:
-                    # 1. 次のブックマークがページP (インデックス) にある場合:
-                    #    end_page = P
-                    #    page_extraction_upper_bound = min(P + 1, len(reader.pages))
-                    #    range(start_page, P + 1) -> page_num は start_page ... P
-                    # 2. これが最後のブックマークの場合:
-                    #    end_page = len(reader.pages)
-                    #    page_extraction_upper_bound = min(len(reader.pages) + 1, len(reader.pages)) = len(reader.pages)
-                    #    range(start_page, len(reader.pages)) -> page_num は start_page ... len(reader.pages) - 1
-
-                    if start_page < page_extraction_upper_bound: # 通常は true (start_page <= end_page のため)
-                        for page_num in range(start_page, page_extraction_upper_bound):
-                            # page_num は常に有効なインデックスになるはず
-                            page = reader.pages[page_num]
-                            page_text = page.extract_text()
-                            if page_text:
-                                chapter_text += page_text
-                    # else の場合 (start_page >= page_extraction_upper_bound)、抽出するページなし。
-                    # chapter_text は空のままなので問題ない。
+                    # 抽出済みのページテキストを結合する (範囲が空の場合、chapter_text は空になる)
+                    chapter_text = "".join(page_texts[page_num] for page_num in page_range)
 
                 # --- マーカー（ブックマークタイトル）ベースのテキスト絞り込み処理 ---
                 # 抽出したページテキスト(chapter_text)から、現在のブックマークタイトル(title)と
@@ -263,24 +399,28 @@ def split_text_by_bookmarks(pdf_path):
                         print(f"  章 '{title}': ページ抽出テキストに対しマーカー絞り込み試行...")
                         # Normalize chapter text and markers for consistent apostrophe handling
                         normalized_chapter_text = _normalize_apostrophes(chapter_text)
-                        normalized_title = _normalize_apostrophes(title)
+                        normalized_title = normalized_titles[i]
 
-                        start_pos = _find_ignoring_whitespace(normalized_chapter_text, normalized_title)
+                        title_match = _search_ignoring_whitespace(normalized_chapter_text, normalized_title)
 
-                        if start_pos != -1:
+                        if title_match is not None:
                             # Content starts after the normalized_title in normalized_chapter_text
-                            content_start_in_normalized = start_pos + len(normalized_title)
+                            # (テキスト側の空白の数はタイトルと異なる場合があるため、タイトルの文字数ではなく一致した範囲の終端を使う)
+                            content_start_in_normalized = title_match.end()
                             if next_title: # 次の章がある場合
-                                normalized_next_title = _normalize_apostrophes(next_title)
+                                normalized_next_title = normalized_titles[i+1]
+                                # 開始マーカー以降で最初に現れる次の章のタイトルを終了マーカーとする
+                                # (末尾から探すと、柱やフッターに繰り返し印字された次の章のタイトルに一致し、
+                                #  次の章の本文まで取り込んでしまうため)
                                 end_pos = _find_ignoring_whitespace(normalized_chapter_text, normalized_next_title, content_start_in_normalized)
                                 if end_pos != -1:
-                                    refined_text = normalized_chapter_text[content_start_in_normalized:end_pos]
+                                    refined_text = _slice_stripped(normalized_chapter_text, content_start_in_normalized, end_pos)
                                     print(f"    -> 開始/終了マーカーで絞り込み成功。")
                                 else:
-                                    refined_text = normalized_chapter_text[content_start_in_normalized:]
+                                    refined_text = _slice_stripped(normalized_chapter_text, content_start_in_normalized)
                                     print(f"    -> 開始マーカーで絞り込み成功（終了マーカーなし）。")
                             else: # 最終章
-                                refined_text = normalized_chapter_text[content_start_in_normalized:]
+                                refined_text = _slice_stripped(normalized_chapter_text, content_start_in_normalized)
                                 print(f"    -> 開始マーカーで絞り込み成功（最終章）。")
                         else:
                             # Show both original and normalized title for debugging
@@ -289,6 +429,7 @@ def split_text_by_bookmarks(pdf_path):
                     except Exception as e_refine: # 念のため絞り込み中のエラーをキャッチ
                         print(f"    -> マーカー絞り込み中に予期せぬエラー: {e_refine}。絞り込みスキップ。")
                         refined_text = chapter_text # エラー時も元のテキストを使用
+                # 絞り込んだテキストは既に前後の空白が除かれているため、strip() はコピーを作らずにそのまま返す
                 chapters[title] = {"text": refined_text.strip(), "level": level}
 
     # --- エラーハンドリング ---
@@ -300,7 +441,26 @@ def split_text_by_bookmarks(pdf_path):
         return None
 
     print(f"ブックマークに基づいて {len(chapters)} 個の章（またはセクション）に分割完了。")
-    return chapters # {章タイトル: {"text": 章テキスト, "level": 階層レベル}} の順序付き辞書を返す
+    return chapters # {章タイトル: {"text": 章テキスト, "level": 階層レベル}} の辞書 (章の順) を返す
+
+def iter_split_text(text, max_chunk_size):
+    """長いテキストを指定された最大文字数以下のチャンクに分割し、チャンクを1つずつ返すジェネレータ。
+
+    全チャンクのリストを作成しないため、チャンクを順に処理する場合は split_text よりメモリ使用量が少なくなります。
+
+    Args:
+        text: 分割対象のテキスト。
+        max_chunk_size: 各チャンクの最大文字数。正の整数である必要があります。
+
+    Yields:
+        分割されたテキストチャンク。
+        入力テキストが空の場合や max_chunk_size が不正な場合は何も返しません。
+    """
+    if not text or max_chunk_size <= 0:
+        return
+    text_length = len(text)
+    for start in range(0, text_length, max_chunk_size):
+        yield text[start:min(start + max_chunk_size, text_length)]
 
 def split_text(text, max_chunk_size):
     """長いテキストを指定された最大文字数以下のチャンクに分割します。
@@ -321,12 +481,7 @@ def split_text(text, max_chunk_size):
         return [] # またはエラーを発生させる
 
     print(f"テキストを最大 {max_chunk_size} 文字のチャンクに分割中...")
-    chunks = [] # 分割後のチャンクを格納するリスト
-    start = 0
-    while start < len(text):
-        end = min(start + max_chunk_size, len(text))
-        chunks.append(text[start:end])
-        start = end
+    chunks = list(iter_split_text(text, max_chunk_size)) # 分割後のチャンクを格納するリスト
     print(f"分割完了。チャンク数: {len(chunks)}")
     return chunks
 
@@ -345,51 +500,6 @@ def extract_text_between_markers(text: str, start_marker: str, end_marker: str)
     Returns:
         抽出された部分文字列。マーカーが見つからない場合は空文字列を返す可能性あり。
     """
-    # --- ヘルパー関数: haystack中の空白を無視してneedleを検索 ---
-    def _find_ignoring_whitespace(haystack, needle, start_offset=0):
-        """
-        haystack内でneedleを検索します。haystackとneedleの両方の空白文字は無視されます。
-        見つかった場合、haystackにおける開始インデックス（空白無視前の元のインデックス）を返します。見つからない場合は-1を返します。 (split_text_by_bookmarks内に移動済み)
-        """
-        if not needle:
-            return start_offset # 空のneedleはオフセット位置で見つかったとみなす
-
-        h_len = len(haystack)
-        n_len = len(needle)
-        h_idx = start_offset
-        n_idx = 0
-        potential_start = -1
-
-        while h_idx < h_len:
-            # haystackの空白をスキップ
-            while h_idx < h_len and haystack[h_idx].isspace():
-                if potential_start == -1: # マッチ開始前ならpotential_startも進める
-                    start_offset += 1
-                h_idx += 1
-            if h_idx == h_len: break # スキップ中に終端に到達
-
-            # needleの空白をスキップ
-            while n_idx < n_len and needle[n_idx].isspace():
-                n_idx += 1
-            if n_idx == n_len: # needleの非空白文字を全てマッチした場合
-                return potential_start # 発見
-
-            # haystackとneedleの非空白文字を比較
-            if h_idx < h_len and n_idx < n_len and haystack[h_idx] == needle[n_idx]:
-                if n_idx == 0: potential_start = h_idx
-                n_idx += 1
-            else: # ミスマッチ
-                if potential_start != -1: # マッチ途中だった場合、検索開始位置を戻す
-                    h_idx = potential_start # 次の検索はpotential_startの次から
-                    potential_start = -1
-                # マッチ途中ではなかった場合、h_idxは次のループでインクリメントされる (下のh_idx += 1)
-                n_idx = 0 # needleポインタをリセット
-            h_idx += 1 # haystackポインタを進める
-        # ループ終了後、needleの残りが空白のみかチェック
-        while n_idx < n_len and needle[n_idx].isspace(): n_idx += 1
-        if n_idx == n_len: return potential_start # マッチ成功
-        return -1 # 見つからなかった
-
     # --- search_start_marker を使用して開始位置を検索 (空白無視) ---
     start_pos = _find_ignoring_whitespace(text, start_marker) # マーカーの前処理を削除したので、直接 start_marker を使用
     if start_pos == -1:
@@ -1,75 +1,23 @@
 import sys
 import json
-import time
+import argparse
+import itertools
+import multiprocessing
 import os # osモジュールをインポート
 import tkinter as tk
 import re # 正規表現モジュールをインポート
-from tkinter import filedialog
-import pandas as pd # pandas をインポート
+import dataclasses
+from typing import Optional
+from tkinter import filedialog, messagebox
+from openpyxl import Workbook # Excelファイルの書き込み用
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from GoogleAdaptor import configure_gemini, translate_text_chunk, authenticate_google_apis, save_to_google_doc, save_to_google_sheet
-from PdfEditor import split_text_by_bookmarks, split_text # extract_text_between_markers は削除
-from tqdm import tqdm # tqdmライブラリをインポート
+from GoogleAdaptor import configure_gemini, configure_translation_cache, translate_text_chunks, translate_text_chunks_batch, authenticate_google_apis, save_to_google_doc, save_to_google_sheet
+from PdfEditor import split_text_by_bookmarks, iter_split_text # extract_text_between_markers は削除
 
 
-def select_pdf_file_old(): # 旧関数は不要になるためリネームまたは削除
-    """GUIでPDFファイルを選択させます (旧バージョン)。
-
-    @deprecated 新しい `select_file_and_format` 関数を使用してください。
-
-    Returns:
-        選択されたPDFファイルの絶対パス。キャンセルされた場合はNone。
-    """
-    root = tk.Tk()
-    root.withdraw() # ルートウィンドウを非表示にする
-    file_path = filedialog.askopenfilename(
-        title="翻訳するPDFファイルを選択してください",
-        filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")]
-    )
-    root.destroy() # ダイアログが閉じたらルートウィンドウを破棄
-    if file_path:
-        print(f"選択されたPDFファイル: {file_path}")
-        return file_path
-    else:
-        print("ファイル選択がキャンセルされました。")
-        return None
-
-def select_output_format_old(): # 旧関数は不要になるためリネームまたは削除
-    """GUIで出力形式を選択させます (旧バージョン)。
-
-    @deprecated 新しい `select_file_and_format` 関数を使用してください。
-
-    Returns:
-        選択された出力形式の識別子。キャンセルされた場合はNone。
-    """
-    root = tk.Tk()
-    root.title("出力形式の選択")
-    root.geometry("300x200") # ウィンドウサイズを調整
-
-    output_format_var = tk.StringVar(value="google_doc") # デフォルト選択
-    selected_format = None # 選択された形式を格納する変数
-
-    tk.Label(root, text="出力形式を選択してください:", pady=10).pack()
-
-    formats = {
-        "Google ドキュメント": "google_doc",
-        "Google スプレッドシート": "google_sheet",
-        "AsciiDoc (ローカル)": "asciidoc",
-        "Excel (ローカル)": "excel"
-    }
-
-    for display_text, value in formats.items():
-        tk.Radiobutton(root, text=display_text, variable=output_format_var, value=value, anchor='w').pack(fill='x', padx=20)
-
-    def on_ok():
-        nonlocal selected_format
-        selected_format = output_format_var.get()
-        root.destroy()
-
-    tk.Button(root, text="OK", command=on_ok, width=10).pack(pady=10)
-    root.mainloop() # ウィンドウを表示し、ユーザーの操作を待つ
-    return selected_format
-
 def select_file_and_format(use_google_drive=True):
     """単一のGUIウィンドウでPDFファイルと出力形式を選択させます。
 
@@ -144,14 +92,11 @@ def select_file_and_format(use_google_drive=True):
             # 選択された形式をリストに収集
             selected_list = [fmt for fmt, var in selected_formats_vars.items() if var.get()]
             if not selected_list:
-                from tkinter import messagebox
                 messagebox.showwarning("出力形式未選択", "少なくとも1つの出力形式を選択してください。")
                 return # ウィンドウを閉じない
             result["output_formats"] = selected_list
             root.destroy()
         else:
-            # messagebox を使うためにインポート
-            from tkinter import messagebox
             messagebox.showwarning("PDF未選択", "翻訳するPDFファイルを選択してください。")
 
     tk.Button(button_frame, text="OK", command=on_ok, width=10).pack(side=tk.LEFT, padx=10)
@@ -160,6 +105,15 @@ def select_file_and_format(use_google_drive=True):
     root.mainloop()
     return result["pdf_path"], result["output_formats"]
 
+# 章の階層レベル (0始まり) に対応する AsciiDoc の見出し記号 ("==", "===", ...)
+_ASCIIDOC_HEADER_PREFIXES = ["=" * (i + 2) for i in range(16)]
+
+# Google API (Docs/Sheets/Drive) の認証が必要な出力形式
+_GOOGLE_OUTPUT_FORMATS = frozenset({"google_doc", "google_sheet"})
+
+# AsciiDocファイル書き込み時のバッファサイズ (バイト)。小さな書き込みをまとめ、システムコールの回数を減らす
+_ASCIIDOC_WRITE_BUFFER_SIZE = 1024 * 1024
+
 def save_to_asciidoc(output_base_path, chapter_titles, translated_chunks, chapter_levels):
     """翻訳結果をAsciiDoc形式のローカルテキストファイルに保存します。
 
@@ -171,7 +125,7 @@ def save_to_asciidoc(output_base_path, chapter_titles, translated_chunks, chapte
         chapter_levels: 各章のブックマーク階層レベル (0始まり) のリスト。
 
     Returns:
-        None
+        保存に成功した場合は True、失敗した場合は False。
     """
     output_dir = os.path.dirname(output_base_path)
     if output_dir and not os.path.exists(output_dir):
@@ -181,19 +135,28 @@ def save_to_asciidoc(output_base_path, chapter_titles, translated_chunks, chapte
     output_adoc_path = f"{output_base_path}.adoc"
     print(f"翻訳結果をAsciiDocファイル '{output_adoc_path}' に保存中...")
     try:
-        with open(output_adoc_path, 'w', encoding='utf-8') as f:
+        with open(output_adoc_path, 'w', encoding='utf-8', buffering=_ASCIIDOC_WRITE_BUFFER_SIZE) as f:
             # AsciiDocのドキュメントタイトルを設定 (ファイル名から)
             doc_title = os.path.basename(output_base_path)
             f.write(f"= {doc_title}\n\n") # ドキュメントタイトル
 
-            for title, text, level in zip(chapter_titles, translated_chunks, chapter_levels):
-                # AsciiDocの見出しレベルは = の数 (レベル0 -> ==, レベル1 -> ===, ...)
-                header_prefix = "=" * (level + 2)
-                f.write(f"{header_prefix} {title}\n\n")
-                f.write(f"{text}\n\n") # 翻訳テキスト
+            def _iter_chapter_parts():
+                for title, text, level in zip(chapter_titles, translated_chunks, chapter_levels):
+                    # AsciiDocの見出しレベルは = の数 (レベル0 -> ==, レベル1 -> ===, ...)
+                    # 想定外に深い階層の場合のみ都度生成する
+                    header_prefix = _ASCIIDOC_HEADER_PREFIXES[level] if level < len(_ASCIIDOC_HEADER_PREFIXES) else "=" * (level + 2)
+                    yield f"{header_prefix} {title}\n\n"
+                    yield str(text) # 翻訳テキスト (文字列の場合は複製せずそのまま渡す)
+                    yield "\n\n"
+
+            # 全体を1つの文字列に結合せず、ファイルのバッファ経由でまとめて書き込む
+            # (書き込みはバッファが満たされるごとに行われ、本文全体の複製もメモリ上に作らない)
+            f.writelines(_iter_chapter_parts())
         print(f"AsciiDocファイルへの保存完了: {output_adoc_path}")
+        return True
     except Exception as e:
         print(f"エラー: AsciiDocファイルへの保存中にエラーが発生しました: {e}")
+        return False
 
 
 # --- Excelセル書き込みのためのサニタイズヘルパー ---
@@ -217,19 +180,17 @@ def _sanitize_for_excel_cell(text):
     return sanitized_text
 
 def _split_text_for_excel(text, max_length):
-    """テキストを指定された最大長以下のチャンクに分割します。"""
+    """テキストを指定された最大長以下のチャンクに分割します。
+
+    チャンクは1つずつ生成するイテレータとして返します (巨大なテキストでも全チャンクのコピーを同時に保持しない)。
+    """
     if not isinstance(text, str): # 文字列でない場合はそのまま返す
-        return [text]
+        return iter([text])
     if len(text) <= max_length:
-        return [text] # 最大長以下なら分割しない
-
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + max_length
-        chunks.append(text[start:end])
-        start = end
-    return chunks
+        return iter([text]) # 最大長以下なら分割しない
+
+    return (text[start:start + max_length] for start in range(0, len(text), max_length))
+
 def save_to_excel(output_base_path, chapter_titles, original_texts, translated_chunks, excel_max_cell_length):
     """翻訳結果をExcelファイル (.xlsx) に保存します。
 
@@ -242,41 +203,159 @@ def save_to_excel(output_base_path, chapter_titles, original_texts, translated_c
         translated_chunks: 各章に対応する翻訳済みテキストのリスト。
 
     Returns:
-        None
+        保存に成功した場合は True、失敗した場合は False。
     """
     output_xlsx_path = f"{output_base_path}.xlsx"
     print(f"翻訳結果をExcelファイル '{output_xlsx_path}' に保存中...")
     try:
+        # 行を1行ずつファイルに書き出す書き込み専用モードで作成し、全行分のデータをメモリ上に保持しない
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet("Sheet1")
+        header_font = Font(bold=True)
+        header_cells = []
+        for header in ("タイトル", "原文", "訳文"):
+            cell = WriteOnlyCell(worksheet, value=header)
+            cell.font = header_font
+            header_cells.append(cell)
+        worksheet.append(header_cells)
+
         # --- セル長超過対応 ---
-        excel_data = [] # Excelに出力するデータを格納するリスト
         for title, original, translated in zip(chapter_titles, original_texts, translated_chunks):
             # 原文と訳文を最大セル長で分割
             original_chunks = _split_text_for_excel(original, excel_max_cell_length)
             translated_chunks_split = _split_text_for_excel(translated, excel_max_cell_length) # 変数名を変更
 
-            # 分割されたチャンクの最大数に合わせて行を作成
-            max_rows = max(len(original_chunks), len(translated_chunks_split))
-
-            for i in range(max_rows):
+            # 分割されたチャンクの最大数に合わせて行を作成 (足りない側のセルは空文字)
+            for i, (original_chunk, translated_chunk) in enumerate(itertools.zip_longest(original_chunks, translated_chunks_split, fillvalue="")):
                 # 最初の行にはタイトルを、それ以降は空文字を設定
-                current_title = _sanitize_for_excel_cell(title if i == 0 else "")
-                # 各行に対応する原文チャンクを取得 (なければ空文字)
-                current_original = _sanitize_for_excel_cell(original_chunks[i] if i < len(original_chunks) else "")
-                # 各行に対応する訳文チャンクを取得 (なければ空文字)
-                current_translated = _sanitize_for_excel_cell(translated_chunks_split[i] if i < len(translated_chunks_split) else "")
-
-                excel_data.append({
-                    "タイトル": current_title,
-                    "原文": current_original,
-                    "訳文": current_translated
-                })
+                worksheet.append([
+                    _sanitize_for_excel_cell(title if i == 0 else ""),
+                    _sanitize_for_excel_cell(original_chunk),
+                    _sanitize_for_excel_cell(translated_chunk),
+                ])
         # --- ここまで ---
 
-        df = pd.DataFrame(excel_data) # 整形されたデータからDataFrameを作成
-        df.to_excel(output_xlsx_path, index=False, engine='openpyxl') # openpyxl をエンジンとして指定
+        workbook.save(output_xlsx_path)
         print(f"Excelファイルへの保存完了: {output_xlsx_path}")
+        return True
     except Exception as e:
         print(f"エラー: Excelファイルへの保存中にエラーが発生しました: {e}")
+        return False
+
+@dataclasses.dataclass(frozen=True)
+class TranslatorConfig:
+    """config.json の設定値。
+
+    `load` で読み込む際に、不正な値の補正とデフォルト値の設定をまとめて行います。
+    必須項目の有無は `missing_required_fields` で確認します。
+    """
+    google_api_key: Optional[str] = None
+    model_name: Optional[str] = None
+    token_json_file: Optional[str] = None
+    legacy_token_pickle_file: Optional[str] = None # 旧形式 (pickle) のトークンファイル。存在すればJSON形式に移行する
+    credentials_file: Optional[str] = None
+    scopes: tuple = () # 設定ファイルに記載されたスコープ (Google Driveを使用しない場合の除外は main で行う)
+    use_google_drive: bool = True
+    max_chunk_size: int = 10000
+    sleep_time: float = 0 # 同時実行枠ごとのAPI呼び出し間の待機時間 (通常は requests_per_minute で制御する)
+    max_concurrency: int = 5 # 翻訳APIの最大同時呼び出し数
+    requests_per_minute: Optional[int] = None # 翻訳APIの1分あたりの呼び出し回数の上限 (利用プランのRPM制限に合わせる)
+    fallback_model_name: Optional[str] = None # サーバー側エラーが続いた場合に使用する代替モデル (任意)
+    retry_count: int = 3
+    initial_retry_delay: float = 1 # リトライ待機時間の基準値（秒）
+    excel_max_cell_length: int = 1000
+    output_file_path: str = "output/result"
+    translation_cache_file: Optional[str] = None # 翻訳キャッシュの保存先 (任意)
+    translation_mode: str = "live" # "batch" の場合は Batch API で翻訳する (--batch-mode と同じ)
+
+    @classmethod
+    def from_dict(cls, config):
+        """設定値の辞書から TranslatorConfig を作成します。
+
+        Args:
+            config: config.json を読み込んだ辞書。
+
+        Returns:
+            TranslatorConfig。
+        """
+        max_chunk_size = config.get("max_chunk_size")
+        # max_chunk_size が数値でない場合のデフォルト値設定やエラー処理を追加
+        if not isinstance(max_chunk_size, int) or max_chunk_size <= 0:
+            print(f"警告: config.json の max_chunk_size ({max_chunk_size}) が不正な値です。デフォルト値 10000 を使用します。")
+            max_chunk_size = 10000 # デフォルト値
+        excel_max_cell_length = config.get("excel_max_cell_length")
+        if not isinstance(excel_max_cell_length, int) or excel_max_cell_length <= 0:
+            print(f"警告: config.json の excel_max_cell_length ({excel_max_cell_length}) が不正な値です。デフォルト値 1000 を使用します。")
+            excel_max_cell_length = 1000 # デフォルト値
+        max_concurrency = config.get("max_concurrency", 5)
+        if not isinstance(max_concurrency, int) or max_concurrency <= 0:
+            print(f"警告: config.json の max_concurrency ({max_concurrency}) が不正な値です。デフォルト値 5 を使用します。")
+            max_concurrency = 5 # デフォルト値
+        requests_per_minute = config.get("requests_per_minute")
+        if requests_per_minute is not None and (not isinstance(requests_per_minute, int) or requests_per_minute <= 0):
+            print(f"警告: config.json の requests_per_minute ({requests_per_minute}) が不正な値です。呼び出し頻度を制限せずに実行します。")
+            requests_per_minute = None # 未指定と同じ扱い
+        token_json_file = config.get("token_json_file")
+        legacy_token_pickle_file = config.get("token_pickle_file")
+        if not token_json_file and legacy_token_pickle_file:
+            token_json_file = os.path.splitext(legacy_token_pickle_file)[0] + ".json"
+        return cls(
+            google_api_key=config.get("google_api_key"),
+            model_name=config.get("model_name"),
+            token_json_file=token_json_file,
+            legacy_token_pickle_file=legacy_token_pickle_file,
+            credentials_file=config.get("credentials_file"),
+            scopes=tuple(config.get("scopes", [])), # スコープリスト、なければ空
+            use_google_drive=config.get("use_google_drive", True), # デフォルトはTrue
+            max_chunk_size=max_chunk_size,
+            sleep_time=config.get("sleep_time", 0),
+            max_concurrency=max_concurrency,
+            requests_per_minute=requests_per_minute,
+            fallback_model_name=config.get("fallback_model_name"),
+            retry_count=config.get("retry_count", 3), # デフォルトリトライ回数を3に設定
+            initial_retry_delay=config.get("initial_retry_delay", 1), # デフォルトのリトライ待機時間の基準値を1秒に設定
+            excel_max_cell_length=excel_max_cell_length,
+            output_file_path=config.get("output_file_path", "output/result"), # デフォルトパス設定
+            translation_cache_file=config.get("translation_cache_file"),
+            translation_mode=config.get("translation_mode", "live"),
+        )
+
+    @classmethod
+    def load(cls, config_path):
+        """設定ファイル (JSON) を読み込みます。
+
+        Args:
+            config_path: 設定ファイルのパス。
+
+        Returns:
+            TranslatorConfig。
+
+        Raises:
+            FileNotFoundError: 設定ファイルが見つからない場合。
+            json.JSONDecodeError: 設定ファイルの形式が不正な場合。
+        """
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    def missing_required_fields(self):
+        """値が設定されていない必須項目の名前のリストを返します。"""
+        # max_chunk_size, retry_count, initial_retry_delay, sleep_time はデフォルト値があるためチェック対象から外す
+        required_fields = ("google_api_key", "model_name", "token_json_file", "credentials_file", "scopes")
+        return [name for name in required_fields if not getattr(self, name)]
+
+def parse_args(argv=None):
+    """コマンドライン引数を解析します。
+
+    Args:
+        argv: 解析する引数のリスト。Noneの場合は sys.argv を使用します。
+
+    Returns:
+        解析結果の `argparse.Namespace`。
+    """
+    parser = argparse.ArgumentParser(description="PDFドキュメントを日本語に翻訳します。")
+    parser.add_argument("--batch-mode", action="store_true",
+                        help="Gemini Batch API を使用して翻訳します (低コストですが完了まで時間がかかります)。")
+    return parser.parse_args(argv)
 
 def main():
     """PDF翻訳ツールのメイン処理。
@@ -288,15 +367,16 @@ def main():
     1. 設定ファイル (config.json) を読み込みます。
     2. GUIでユーザーにPDFファイルと出力形式を選択させます。
     3. Google API (Gemini, Docs, Drive, Sheets) の認証と設定を行います (必要に応じて)。
-    4. PDFをブックマークに基づいて章分割します。
+    4. PDFをブックマークに基づいて章分割します (3. の認証と並行して別スレッドで実行します)。
     5. 各章のテキストを、必要であればさらにチャンク分割して翻訳APIを呼び出します。
     6. 翻訳結果を選択された形式 (Google Docs/Sheets, AsciiDoc, Excel) で保存します。
     @return None
     """
+    args = parse_args()
+
     # 設定ファイルを読み込む
     try:
-        with open('config.json', 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        config = TranslatorConfig.load('config.json')
     except FileNotFoundError:
         print("エラー: config.json が見つかりません。")
         sys.exit(1)
@@ -304,79 +384,71 @@ def main():
         print("エラー: config.json の形式が不正です。")
         sys.exit(1)
 
-    # --- 設定値の取得 ---
-    # pdf_file_path = config.get("pdf_file_path") # config.json から読み込む代わりにGUIで選択
-    max_chunk_size = config.get("max_chunk_size")
-    # max_chunk_size が数値でない場合のデフォルト値設定やエラー処理を追加
-    if not isinstance(max_chunk_size, int) or max_chunk_size <= 0:
-        print(f"警告: config.json の max_chunk_size ({max_chunk_size}) が不正な値です。デフォルト値 10000 を使用します。")
-        max_chunk_size = 10000 # デフォルト値
-
-    google_api_key = config.get("google_api_key")
-    sleep_time = config.get("sleep_time")
-    model_name = config.get("model_name")
-    token_pickle_file = config.get("token_pickle_file")
-    credentials_file = config.get("credentials_file")
-    scopes_from_config = config.get("scopes", []) # スコープリスト、なければ空リスト
-    use_google_drive = config.get("use_google_drive", True) # デフォルトはTrue
-    retry_count = config.get("retry_count", 2) # デフォルトリトライ回数を2に設定
-    initial_retry_delay = config.get("initial_retry_delay", 5) # デフォルト初期遅延を5秒に設定
-    # output_format はGUIで選択
-    excel_max_cell_length = config.get("excel_max_cell_length")
-    if not isinstance(excel_max_cell_length, int) or excel_max_cell_length <= 0:
-        print(f"警告: config.json の excel_max_cell_length ({excel_max_cell_length}) が不正な値です。デフォルト値 1000 を使用します。")
-        excel_max_cell_length = 1000 # デフォルト値
-
-
-    output_file_path = config.get("output_file_path", "output/result") # デフォルトパス設定
-
     # Google Driveを使用しない場合は、関連スコープを除外
-    scopes = scopes_from_config
-    if not use_google_drive:
-        scopes = [s for s in scopes_from_config if 'drive' not in s and 'spreadsheets' not in s and 'documents' not in s]
+    scopes = list(config.scopes)
+    if not config.use_google_drive:
+        scopes = [s for s in config.scopes if 'drive' not in s and 'spreadsheets' not in s and 'documents' not in s]
         print("情報: Google Driveを使用しない設定のため、関連APIスコープを除外しました。")
 
     # --- 1. GUIでPDFファイルと出力形式を選択 ---
-    pdf_file_path, selected_output_formats = select_file_and_format(use_google_drive)
+    pdf_file_path, selected_output_formats = select_file_and_format(config.use_google_drive)
 
     if not pdf_file_path or not selected_output_formats:
         print("PDFファイルまたは出力形式が選択されなかった（キャンセルされた）ため、処理を終了します。")
         sys.exit(0)
     print(f"選択された出力形式: {', '.join(selected_output_formats)}")
+    # Google API の認証が必要な出力形式が選択されているか (認証結果のチェックに使用する)
+    needs_google_output = not _GOOGLE_OUTPUT_FORMATS.isdisjoint(selected_output_formats)
     # --- ここまで ---
     # --- 必須設定値のチェック ---
-    # max_chunk_size, retry_count, initial_retry_delay はデフォルト値があるためチェック対象から外す
-    if not all([google_api_key, sleep_time is not None, model_name, token_pickle_file, credentials_file, scopes_from_config]): # 元のscopes_from_configでチェック
-        print("エラー: config.json に必須の設定項目が不足しています。")
-        print("必要な項目: google_api_key, sleep_time, model_name, token_pickle_file, credentials_file, scopes, use_google_drive, output_file_path")
+    missing_fields = config.missing_required_fields() # 除外前の config.scopes でチェック
+    if missing_fields:
+        print(f"エラー: config.json に必須の設定項目が不足しています: {', '.join(missing_fields)}")
+        print("必要な項目: google_api_key, model_name, token_json_file, credentials_file, scopes, use_google_drive, output_file_path")
         sys.exit(1) # 設定不足はエラーとして 1 で終了
 
-    filename = pdf_file_path.split('/')[-1].split('.')[0]   # PDFファイルパスから拡張子を除いたファイル名を取得
+    filename = os.path.splitext(os.path.basename(pdf_file_path))[0] # PDFファイルパスから拡張子を除いたファイル名を取得
     # --- 出力ファイル名/タイトルの設定 (複数形式に対応) ---
     # Google Drive 用のタイトルと同じサフィックスを付ける
     filename_with_suffix = f"{filename}_translated"
     # output_file_path からディレクトリ部分を取得
-    output_dir = os.path.dirname(output_file_path)
+    output_dir = os.path.dirname(config.output_file_path)
     output_base_path = os.path.join(output_dir, filename_with_suffix) # 例: "output/filename_translated"
     # Google Drive 用のドキュメント/スプレッドシートタイトル
     output_title = filename_with_suffix # ローカル保存と同じベース名を使用
 
+    # PDFの章分割 (ファイル読み込み・テキスト抽出) は認証 (ネットワーク通信やブラウザでの承認待ち) と
+    # 独立しているため、先に別スレッドで開始し、認証と並行して実行する
+    pdf_executor = ThreadPoolExecutor(max_workers=1)
+    chapters_future = pdf_executor.submit(split_text_by_bookmarks, pdf_file_path)
+    pdf_executor.shutdown(wait=False) # 投入済みの章分割は完了まで実行される
+
     # --- 2. Gemini APIの設定 ---
-    configure_gemini(google_api_key) # configure自体はリトライ不要と想定
+    configure_gemini(config.google_api_key) # configure自体はリトライ不要と想定
+    # 同一テキストの再翻訳を避けるためのキャッシュ
+    # translation_cache_file が未指定でも、出力先の横に進捗ファイルを作成して翻訳結果を1件ずつ記録する
+    # (途中で異常終了しても、再実行時に翻訳済みのチャンクはAPIを呼び出さずに再利用される)
+    # 進捗ファイルは再開のためだけのものなので、全ての出力の保存に成功したら削除する
+    progress_file = None if config.translation_cache_file else f"{output_base_path}.progress.sqlite3"
+    translation_cache_file = config.translation_cache_file or progress_file
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+        print(f"出力ディレクトリ '{output_dir}' を作成しました。")
+    configure_translation_cache(translation_cache_file)
 
     # --- 3. Google APIs (Docs, Drive, Sheets) の認証 (必要に応じて) ---
     # 渡すスコープは use_google_drive に基づいてフィルタリングされたもの
-    docs_service, drive_service, gspread_client = authenticate_google_apis(token_pickle_file, credentials_file, scopes) # 認証プロセス内のAPI呼び出しはリトライ対象外とする
+    docs_service, drive_service, gspread_client, sheets_service, sheets_drive_service = authenticate_google_apis(config.token_json_file, config.credentials_file, scopes, config.legacy_token_pickle_file) # 認証プロセス内のAPI呼び出しはリトライ対象外とする
     # Google Driveを使用しない場合、drive_service は None になる可能性がある
     # Google関連の出力形式が選択されている場合、必要なサービスが認証されているか後でチェックする
     # ここでのチェックは簡略化（認証関数がNoneを返した場合のみエラーとする）
-    if any(fmt.startswith("google") for fmt in selected_output_formats) and (docs_service is None or drive_service is None or gspread_client is None):
+    if needs_google_output and (docs_service is None or drive_service is None or gspread_client is None or sheets_service is None or sheets_drive_service is None):
         print("Google API認証に失敗したため、処理を終了します。(Google出力形式選択時)")
         sys.exit(1)
 
     # --- 4. PDFをブックマークに基づいて章分割 ---
     # split_text_by_bookmarks は {章タイトル: {"text": 章テキスト, "level": 階層レベル}} の辞書を返す
-    chapters_dict = split_text_by_bookmarks(pdf_file_path)
+    chapters_dict = chapters_future.result() # 別スレッドで実行中の章分割の完了を待つ
     if not chapters_dict:
         print("PDFから章を抽出できませんでした（ブックマークがないか、処理エラー）。処理を終了します。")
         sys.exit()
@@ -390,70 +462,64 @@ def main():
     print(f"PDFは {len(chapter_texts)} 個の章（またはセクション）に分割されました。")
 
     # --- 5. 各章を翻訳 ---
-    translated_chapters = [] # 変数名をより明確に
-    original_texts_for_output = [] # 出力用の原文リスト (Excel/Spreadsheet用)
-    print(f"合計 {len(chapter_texts)} 個の章を翻訳します...")
-
     # --- 動作確認用: 処理する最大章数を設定 ---
     # 通常実行時は None に設定するか、このブロック自体を削除/コメントアウト
     MAX_CHAPTERS_FOR_TEST = None # 通常実行時は None に設定するか、このブロック自体を削除
     # --- ここまで ---
 
-    # tqdmのtotalを計算（章数またはMAX_CHAPTERS_FOR_TESTの小さい方、Noneの場合も考慮）
-    total_chapters_to_process = min(len(chapter_texts), MAX_CHAPTERS_FOR_TEST) if 'MAX_CHAPTERS_FOR_TEST' in locals() and MAX_CHAPTERS_FOR_TEST is not None else len(chapter_texts)
+    # 処理する章数（章数またはMAX_CHAPTERS_FOR_TESTの小さい方、Noneの場合も考慮）
+    total_chapters_to_process = min(len(chapter_texts), MAX_CHAPTERS_FOR_TEST) if MAX_CHAPTERS_FOR_TEST is not None else len(chapter_texts)
+    if total_chapters_to_process < len(chapter_texts):
+        print(f"動作確認のため、{MAX_CHAPTERS_FOR_TEST}章で処理を中断します。")
+    print(f"合計 {total_chapters_to_process} 個の章を翻訳します...")
 
-    # tqdmで章ごとの進捗を表示
-    # chapter_texts には split_text_by_bookmarks で抽出・絞り込みされたテキストが入っている
-    for i, chapter_text_from_pdf in enumerate(tqdm(chapter_texts, desc="章翻訳処理", total=total_chapters_to_process, unit="章")):
-        # --- 動作確認用: 上限に達したらループを抜ける ---
-        # MAX_CHAPTERS_FOR_TEST が定義されていて None でなく、現在のインデックスがそれを超えた場合
-        if 'MAX_CHAPTERS_FOR_TEST' in locals() and MAX_CHAPTERS_FOR_TEST is not None and i >= MAX_CHAPTERS_FOR_TEST:
-            print(f"\n動作確認のため、{MAX_CHAPTERS_FOR_TEST}章で処理を中断します。")
-            break
-        # --- ここまで ---
+    # スプレッドシート/Excelには、実際に翻訳APIに渡したテキスト(またはその元となった章テキスト)を記録
+    # (split_text_by_bookmarksで絞り込まれたテキスト)
+    original_texts_for_output = chapter_texts[:total_chapters_to_process] # 出力用の原文リスト (Excel/Spreadsheet用)
+    # 章ごとの翻訳結果 (章のインデックスの位置に格納する)
+    translated_chapters = [None] * total_chapters_to_process
 
+    # 全章のテキストを翻訳APIに渡すチャンクのリストにまとめる
+    # chapter_texts には split_text_by_bookmarks で抽出・絞り込みされたテキストが入っている
+    chunks_to_translate = [] # 翻訳APIに渡すチャンクのリスト (全章分)
+    chapter_chunk_ranges = [] # 各章に対応するチャンクの範囲 (開始, 終了) のリスト
+    for i, text_to_translate in enumerate(original_texts_for_output):
+        # 翻訳対象のテキスト (絞り込み後 or 元の章テキスト) が最大チャンクサイズを超える場合は分割する
+        chapter_start = len(chunks_to_translate)
+        if len(text_to_translate) > config.max_chunk_size:
+            print(f"  章 '{chapter_titles[i]}' のテキスト長 ({len(text_to_translate)}) が最大チャンクサイズ ({config.max_chunk_size}) を超過。分割して翻訳します。")
+            # 章ごとの中間リストを作らず、分割したチャンクを直接全体のリストに追加する
+            chunks_to_translate.extend(iter_split_text(text_to_translate, config.max_chunk_size))
+        else:
+            chunks_to_translate.append(text_to_translate)
+        chapter_chunk_ranges.append((chapter_start, len(chunks_to_translate)))
+
+    # 全チャンクをまとめて翻訳 (translate_text_chunks内でバッチ化とリトライが行われる)
+    if args.batch_mode or config.translation_mode == "batch":
+        translated_chunks = translate_text_chunks_batch(chunks_to_translate, config.model_name, config.google_api_key,
+                                                        config.retry_count, config.initial_retry_delay,
+                                                        sleep_time=config.sleep_time, max_workers=config.max_concurrency,
+                                                        requests_per_minute=config.requests_per_minute)
+    else:
+        translated_chunks = translate_text_chunks(chunks_to_translate, config.model_name,
+                                                  config.retry_count, config.initial_retry_delay,
+                                                  sleep_time=config.sleep_time, max_workers=config.max_concurrency,
+                                                  requests_per_minute=config.requests_per_minute,
+                                                  fallback_model_name=config.fallback_model_name)
+
+    # チャンク単位の翻訳結果を章ごとに結合
+    translation_failed = False # 翻訳に失敗した章があるか (ある場合は再実行に備えて進捗ファイルを残す)
+    for i, (start, end) in enumerate(chapter_chunk_ranges):
         current_chapter_title = chapter_titles[i] # 現在の章タイトル
-        # PdfEditor.py内で絞り込みが行われたテキストを使用
-        text_to_translate = chapter_text_from_pdf # split_text_by_bookmarks から取得したテキストをそのまま使用
-        print(f"\n--- 章 {i+1}/{total_chapters_to_process}: '{current_chapter_title}' (処理対象テキスト長: {len(text_to_translate)}) を処理中 ---")
-
-        # スプレッドシート/Excelには、実際に翻訳APIに渡したテキスト(またはその元となった章テキスト)を記録
-        # (split_text_by_bookmarksで絞り込まれたテキスト)
-        original_texts_for_output.append(text_to_translate)
-
-        translated_chapter = "" # この章全体の翻訳結果を格納する変数
-
-        try:
-            # 翻訳対象のテキスト (絞り込み後 or 元の章テキスト) が最大チャンクサイズを超えるかチェック
-            if len(text_to_translate) > max_chunk_size:
-                print(f"  テキスト長 ({len(text_to_translate)}) が最大チャンクサイズ ({max_chunk_size}) を超過。分割して翻訳します。")
-                sub_chunks = split_text(text_to_translate, max_chunk_size)
-                translated_sub_chunks = []
-                # 分割されたサブチャンクを翻訳 (サブチャンクごとの進捗表示)
-                for j, sub_chunk in enumerate(tqdm(sub_chunks, desc=f"    章{i+1}内チャンク翻訳", leave=False, unit="サブチャンク")):
-                    # translate_text_chunk内でリトライが行われる
-                    translated_sub = translate_text_chunk(sub_chunk, model_name, retry_count, initial_retry_delay)
-                    translated_sub_chunks.append(translated_sub if translated_sub else "") # 翻訳失敗時は空文字を追加
-                    # print(f"    サブチャンク {j+1} 翻訳完了。{sleep_time} 秒待機...")
-                    time.sleep(sleep_time)
-                # 分割された翻訳結果を結合
-                translated_chapter = "\n".join(translated_sub_chunks)
-                print(f"  章 '{current_chapter_title}' の分割翻訳完了。")
-            else:
-                # テキストがmax_chunk_size以下の場合、そのまま翻訳
-                print(f"  テキスト長 ({len(text_to_translate)}) が最大チャンクサイズ以下。直接翻訳します。")
-                # translate_text_chunk内でリトライが行われる
-                translated_chapter = translate_text_chunk(text_to_translate, model_name, retry_count, initial_retry_delay)
-                print(f"  章 '{current_chapter_title}' 翻訳完了。")
-                time.sleep(sleep_time) # 翻訳APIへの負荷軽減のため待機
-
-            translated_chapters.append(translated_chapter) # 翻訳結果をリストに追加
-
-        except Exception as e: # 翻訳API呼び出し等でのエラー
-            print(f"エラー: 章 '{current_chapter_title}' (インデックス {i}) の翻訳処理中にエラーが発生しました: {e}。この章をスキップします。")
-            translated_chapters.append(f"--- 章 '{current_chapter_title}' 翻訳失敗: {e} ---") # エラーが発生した章のプレースホルダー
-            # エラー時も原文リストには対応する要素を追加しておく（空文字など）
-            # original_texts_for_output.append(text_to_translate) # 上で追加済み
+        chapter_results = translated_chunks[start:end]
+        error = next((r for r in chapter_results if isinstance(r, Exception)), None)
+        if error is not None: # 翻訳API呼び出し等でのエラー
+            print(f"エラー: 章 '{current_chapter_title}' (インデックス {i}) の翻訳処理中にエラーが発生しました: {error}。この章をスキップします。")
+            translated_chapters[i] = f"--- 章 '{current_chapter_title}' 翻訳失敗: {error} ---" # エラーが発生した章のプレースホルダー
+            translation_failed = True
+        else:
+            # 分割された翻訳結果を結合
+            translated_chapters[i] = "\n".join(chapter_results)
 
     # --- 6. 選択された形式で翻訳結果を保存 ---
     # 処理された章の数を取得 (翻訳ループが途中で終了した場合を考慮)
@@ -473,39 +539,74 @@ def main():
     output_chapter_levels = chapter_levels[:num_processed_chapters]
 
     # --- 選択された各形式で保存処理を実行 ---
-    for output_format in selected_output_formats:
-        print(f"\n--- 出力形式 '{output_format}' で保存を開始 ---")
+    # 各形式の保存処理は互いに独立しているため、スレッドで並行して保存する
+    # (いずれも翻訳結果のリストを読み取るだけなのでロックは不要。所要時間は各形式の合計ではなく最大になる)
+    save_futures = {} # Future -> 出力形式
+    all_saved = True # 選択された全ての形式の保存に成功したか
+    with ThreadPoolExecutor(max_workers=max(1, len(selected_output_formats))) as save_executor:
+        for output_format in selected_output_formats:
+            print(f"\n--- 出力形式 '{output_format}' で保存を開始 ---")
+            try:
+                if output_format == "google_doc":
+                    # Google Driveを使用する設定かつ、認証が成功している場合のみ実行
+                    if not config.use_google_drive or not docs_service or not drive_service:
+                        print("エラー: Googleドキュメントへの保存に必要な設定または認証が不足しています。スキップします。")
+                        all_saved = False
+                        continue # 次の形式へ
+                    future = save_executor.submit(save_to_google_doc, docs_service, drive_service, output_title, output_chapter_titles,
+                                                  translated_chapters, output_chapter_levels,
+                                                  max_retries=config.retry_count, initial_delay=config.initial_retry_delay)
+                    save_futures[future] = output_format
+                elif output_format == "google_sheet":
+                    # Google Driveを使用する設定の場合のみ実行 (SheetsもDrive APIを使うことがあるため)
+                    if not config.use_google_drive or not gspread_client or not sheets_service or not sheets_drive_service: # 必要なサービスを確認
+                         print("エラー: Googleスプレッドシートへの保存に必要な設定または認証が不足しています。スキップします。")
+                         all_saved = False
+                         continue # 次の形式へ
+                    # 1回の書き込みで済むよう、[タイトル, 原文, 訳文] の2次元リストにまとめて渡す
+                    sheet_rows = [[t, o, tr] for t, o, tr in zip(output_chapter_titles, original_texts_for_output, translated_chapters)]
+                    # ドキュメントの保存と並行して実行されるため、Drive API も専用の HTTP クライアントを持つサービスを使う
+                    future = save_executor.submit(save_to_google_sheet, gspread_client, sheets_service, sheets_drive_service, output_title, sheet_rows,
+                                                  max_retries=config.retry_count, initial_delay=config.initial_retry_delay)
+                    save_futures[future] = output_format
+                elif output_format == "asciidoc":
+                    future = save_executor.submit(save_to_asciidoc, output_base_path, output_chapter_titles, translated_chapters, output_chapter_levels)
+                    save_futures[future] = output_format
+                elif output_format == "excel":
+                    future = save_executor.submit(save_to_excel, output_base_path, output_chapter_titles, original_texts_for_output, translated_chapters, config.excel_max_cell_length)
+                    save_futures[future] = output_format
+                else:
+                    # 基本的にここには到達しないはず (GUIで選択されたもののみのため)
+                    print(f"警告: 未知の出力形式 '{output_format}' が指定されました。スキップします。")
+                    all_saved = False
+            except Exception as save_e:
+                # 各保存処理中の予期せぬエラーをキャッチ
+                print(f"エラー: 出力形式 '{output_format}' での保存中にエラーが発生しました: {save_e}")
+                all_saved = False
+                # エラーが発生しても、他の形式の保存は試みる
+
+        for future in as_completed(save_futures):
+            output_format = save_futures[future]
+            try:
+                if not future.result(): # 保存関数はエラーを表示したうえで False を返す
+                    all_saved = False
+            except Exception as save_e:
+                print(f"エラー: 出力形式 '{output_format}' での保存中にエラーが発生しました: {save_e}")
+                all_saved = False
+
+    if progress_file and all_saved and not translation_failed:
+        configure_translation_cache() # 進捗ファイルを閉じてから削除する (Windows では開いたままのファイルは削除できない)
         try:
-            if output_format == "google_doc":
-                # Google Driveを使用する設定かつ、認証が成功している場合のみ実行
-                if not use_google_drive or not docs_service or not drive_service:
-                    print("エラー: Googleドキュメントへの保存に必要な設定または認証が不足しています。スキップします。")
-                    continue # 次の形式へ
-                save_to_google_doc(docs_service, drive_service, output_title, output_chapter_titles,
-                                   translated_chapters, output_chapter_levels,
-                                   max_retries=retry_count, initial_delay=initial_retry_delay)
-            elif output_format == "google_sheet":
-                # Google Driveを使用する設定の場合のみ実行 (SheetsもDrive APIを使うことがあるため)
-                if not use_google_drive or not gspread_client or not drive_service: # 必要なサービスを確認
-                     print("エラー: Googleスプレッドシートへの保存に必要な設定または認証が不足しています。スキップします。")
-                     continue # 次の形式へ
-                save_to_google_sheet(gspread_client, drive_service, output_title, output_chapter_titles,
-                                     original_texts_for_output, translated_chapters,
-                                     max_retries=retry_count, initial_delay=initial_retry_delay)
-            elif output_format == "asciidoc":
-                save_to_asciidoc(output_base_path, output_chapter_titles, translated_chapters, output_chapter_levels)
-            elif output_format == "excel":
-                save_to_excel(output_base_path, output_chapter_titles, original_texts_for_output, translated_chapters, excel_max_cell_length)
-            else:
-                # 基本的にここには到達しないはず (GUIで選択されたもののみのため)
-                print(f"警告: 未知の出力形式 '{output_format}' が指定されました。スキップします。")
-        except Exception as save_e:
-            # 各保存処理中の予期せぬエラーをキャッチ
-            print(f"エラー: 出力形式 '{output_format}' での保存中にエラーが発生しました: {save_e}")
-            # エラーが発生しても、他の形式の保存は試みる
+            os.remove(progress_file)
+        except OSError as e:
+            print(f"警告: 進捗ファイル '{progress_file}' を削除できませんでした: {e}")
+    elif progress_file:
+        print(f"翻訳の進捗を '{progress_file}' に保存しました。再実行すると翻訳済みの部分はAPIを呼び出さずに再利用されます。")
 
     print("--- PDF翻訳完了 ---")
 
 # このスクリプトが直接実行された場合にmain()関数を呼び出す
 if __name__ == "__main__":
+    # PDFのページテキスト抽出で使用するワーカープロセスを、実行ファイル化した環境でも起動できるようにする
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
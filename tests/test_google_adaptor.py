@@ -0,0 +1,70 @@
+import types
+
+import pytest
+
+import GoogleAdaptor
+from utils import TranslationCache
+
+
+@pytest.fixture
+def translation_cache(monkeypatch):
+    cache = TranslationCache()
+    monkeypatch.setattr(GoogleAdaptor, "_translation_cache", cache)
+    return cache
+
+def test_identical_uncached_chunks_are_translated_once(translation_cache):
+    translation_cache.put("model", "cached text", "キャッシュ済み")
+    chunks = ["first text", "cached text", "", "first text\r\n", "second text", "first text"]
+    translated = [""] * len(chunks)
+
+    uncached_indices, duplicate_of = GoogleAdaptor._collect_uncached_chunks(chunks, "model", translated)
+
+    assert uncached_indices == [0, 4]
+    assert duplicate_of == {3: 0, 5: 0}
+    assert translated[1] == "キャッシュ済み"
+
+    translated[0] = "最初のテキスト"
+    translated[4] = RuntimeError("failed")
+    GoogleAdaptor._fill_duplicate_chunks(translated, duplicate_of)
+    assert translated[3] == translated[5] == "最初のテキスト"
+
+def test_chunks_differing_in_line_structure_are_not_deduplicated(translation_cache):
+    chunks = ["paragraph one\n\nparagraph two", "paragraph one paragraph two"]
+    uncached_indices, duplicate_of = GoogleAdaptor._collect_uncached_chunks(chunks, "model", [""] * len(chunks))
+    assert uncached_indices == [0, 1]
+    assert duplicate_of == {}
+
+def test_chunks_are_grouped_without_exceeding_the_token_budget():
+    # 見積もりトークン数は 文字数 // 4 + 1
+    text_chunks = ["a" * 36, "b" * 36, "c" * 36, "d" * 400, "e" * 4]
+    batches = GoogleAdaptor._group_chunks_by_tokens([0, 1, 2, 3, 4], text_chunks, max_batch_tokens=20)
+    # 単独で上限を超えるチャンクはそれだけで1つのバッチになる
+    assert batches == [[0, 1], [2], [3], [4]]
+
+class _FakeModel:
+    def __init__(self, response_text):
+        self.response_text = response_text
+        self.prompts = []
+
+    def generate_content(self, prompt, generation_config=None):
+        self.prompts.append(prompt)
+        return types.SimpleNamespace(text=self.response_text)
+
+def _translate_with_response(monkeypatch, batch_chunks, response_text):
+    model = _FakeModel(response_text)
+    monkeypatch.setattr(GoogleAdaptor, "_get_model", lambda model_name, system_instruction=None: model)
+    return GoogleAdaptor._translate_batch_as_json(batch_chunks, "model", max_retries=0, initial_delay=0)
+
+def test_json_batch_response_is_returned_in_input_order(monkeypatch):
+    result = _translate_with_response(monkeypatch, ["one", "two"], '[" いち ", "に\\n"]')
+    assert result == ["いち", "に"]
+
+@pytest.mark.parametrize("response_text", [
+    "not json",
+    '{"translations": ["いち", "に"]}', # 配列でない
+    '["いち"]', # 要素数が一致しない
+    '["いち", 2]', # 文字列でない要素がある
+])
+def test_unusable_json_batch_response_returns_none(monkeypatch, response_text):
+    # None を返すと、呼び出し元はチャンクごとの翻訳にフォールバックする
+    assert _translate_with_response(monkeypatch, ["one", "two"], response_text) is None
@@ -0,0 +1,12 @@
+from main import TranslatorConfig
+
+
+def test_invalid_concurrency_settings_fall_back_at_load_time():
+    config = TranslatorConfig.from_dict({"max_concurrency": 0, "requests_per_minute": -1})
+    assert config.max_concurrency == 5
+    assert config.requests_per_minute is None
+
+def test_valid_concurrency_settings_are_kept():
+    config = TranslatorConfig.from_dict({"max_concurrency": 8, "requests_per_minute": 30})
+    assert config.max_concurrency == 8
+    assert config.requests_per_minute == 30
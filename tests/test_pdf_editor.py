@@ -0,0 +1,77 @@
+from PdfEditor import split_text_by_bookmarks
+
+
+def _escape_pdf_string(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def _write_pdf(path, pages, bookmarks):
+    """テスト用に、各ページに行を描画し、ブックマークを付けた最小限のPDFを作成します。
+
+    Args:
+        path: 作成するPDFファイルのパス。
+        pages: ページごとの行 (文字列) のリスト。行は上から順に描画されます。
+        bookmarks: (タイトル, ページ番号 (0始まり)) のリスト。
+    """
+    num_pages = len(pages)
+    # オブジェクト番号: 1=Catalog, 2=Pages, 3=Font, 4=Outlines,
+    # 5..=各ページ (Page, Contents の順), その後に各ブックマーク
+    page_ids = [5 + 2 * i for i in range(num_pages)]
+    bookmark_ids = [5 + 2 * num_pages + i for i in range(len(bookmarks))]
+    objects = {
+        1: "<< /Type /Catalog /Pages 2 0 R /Outlines 4 0 R /PageMode /UseOutlines >>",
+        2: f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {num_pages} >>",
+        3: "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        4: f"<< /Type /Outlines /First {bookmark_ids[0]} 0 R /Last {bookmark_ids[-1]} 0 R /Count {len(bookmarks)} >>",
+    }
+    for page_id, lines in zip(page_ids, pages):
+        operations = ["BT", "/F1 12 Tf", "72 800 Td"]
+        for line in lines:
+            operations += [f"({_escape_pdf_string(line)}) Tj", "0 -20 Td"]
+        operations.append("ET")
+        stream = "\n".join(operations)
+        objects[page_id] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>")
+        objects[page_id + 1] = f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream"
+    for i, (bookmark_id, (title, page_num)) in enumerate(zip(bookmark_ids, bookmarks)):
+        links = ""
+        if i > 0:
+            links += f" /Prev {bookmark_id - 1} 0 R"
+        if i + 1 < len(bookmarks):
+            links += f" /Next {bookmark_id + 1} 0 R"
+        objects[bookmark_id] = (f"<< /Title ({_escape_pdf_string(title)}) /Parent 4 0 R{links} "
+                                f"/Dest [{page_ids[page_num]} 0 R /XYZ 0 842 0] >>")
+
+    data = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = len(data)
+        data += f"{object_id} 0 obj\n{objects[object_id]}\nendobj\n".encode("latin-1")
+    xref_offset = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for object_id in sorted(objects):
+        data += f"{offsets[object_id]:010d} 00000 n \n".encode("latin-1")
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(data)
+
+def test_end_marker_ignores_repeated_footer_of_next_chapter(tmp_path):
+    # 各ページの末尾には、そのページの章タイトルが柱 (フッター) として印字されている
+    # 章1の抽出範囲には章2の開始ページも含まれるため、章2のフッターも章1のテキストに含まれる
+    pdf_path = str(tmp_path / "footer.pdf")
+    _write_pdf(pdf_path, [
+        ["Chapter One", "first body of the first chapter", "Chapter One"],
+        # 末尾付近だけを探索する範囲に収まらないよう、章2の開始ページには十分な量の本文を置く
+        ["Chapter Two", "start of the second chapter",
+         *(f"line {n} of the second chapter on its first page" for n in range(30)), "Chapter Two"],
+        ["rest of the second chapter", "Chapter Two"],
+    ], [("Chapter One", 0), ("Chapter Two", 1)])
+
+    chapters = split_text_by_bookmarks(pdf_path)
+
+    assert list(chapters) == ["Chapter One", "Chapter Two"]
+    chapter_one = chapters["Chapter One"]["text"]
+    assert "first body of the first chapter" in chapter_one
+    # 章1は章2の見出し (最初に現れる次の章のタイトル) で終わり、章2の本文を含まない
+    assert "start of the second chapter" not in chapter_one
+    assert "start of the second chapter" in chapters["Chapter Two"]["text"]
+    assert "rest of the second chapter" in chapters["Chapter Two"]["text"]
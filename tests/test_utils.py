@@ -0,0 +1,146 @@
+import threading
+
+import httplib2
+import pytest
+from google.api_core.exceptions import ServiceUnavailable
+from googleapiclient.errors import HttpError
+
+import utils
+from utils import RateController, RateLimiter, TranslationCache, retry_api_call
+
+
+def test_cache_key_ignores_line_ending_and_trailing_whitespace_only():
+    make_key = TranslationCache.make_key
+    assert make_key("model", "first line\r\nsecond line  \n") == make_key("model", "first line\nsecond line")
+    # 改行や段落の構成が異なるテキストは別のキーになる
+    assert make_key("model", "first line\nsecond line") != make_key("model", "first line second line")
+    assert make_key("model", "paragraph one\n\nparagraph two") != make_key("model", "paragraph one\nparagraph two")
+
+def test_cache_key_depends_on_model_and_namespace():
+    make_key = TranslationCache.make_key
+    assert make_key("model-a", "text") != make_key("model-b", "text")
+    assert make_key("model", "text", "prompt-v1") != make_key("model", "text", "prompt-v2")
+
+def test_cache_round_trips_through_sqlite(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    cache = TranslationCache(db_path=db_path, namespace="v1")
+    cache.put("model", "hello", "こんにちは")
+    cache.put("model", "hello", "やあ") # 同じキーは新しい翻訳結果で上書きされる
+    cache.close()
+
+    reopened = TranslationCache(db_path=db_path, namespace="v1")
+    assert reopened.get("model", "hello") == "やあ"
+    assert reopened.get("other-model", "hello") is None
+    reopened.close()
+
+    # 名前空間 (プロンプトのバージョン) が異なる場合は以前の翻訳結果を使用しない
+    changed_prompt = TranslationCache(db_path=db_path, namespace="v2")
+    assert changed_prompt.get("model", "hello") is None
+    changed_prompt.close()
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = TranslationCache(maxsize=2)
+    cache.put("model", "a", "A")
+    cache.put("model", "b", "B")
+    assert cache.get("model", "a") == "A" # a を最近使用したものにする
+    cache.put("model", "c", "C")
+    assert cache.get("model", "b") is None
+    assert cache.get("model", "a") == "A"
+    assert cache.get("model", "c") == "C"
+
+class _FakeClock:
+    """time.monotonic / time.sleep の代わりに使用する、sleep した分だけ進む時計。"""
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def fake_clock(monkeypatch):
+    clock = _FakeClock()
+    monkeypatch.setattr(utils.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(utils.time, "sleep", clock.sleep)
+    return clock
+
+def test_rate_limiter_waits_once_the_bucket_is_empty(fake_clock):
+    limiter = RateLimiter(2, period=60.0)
+    limiter.acquire()
+    limiter.acquire()
+    assert fake_clock.sleeps == []
+    limiter.acquire() # 1回分のトークンが補充されるまで (60 / 2 秒) 待機する
+    assert fake_clock.sleeps == [pytest.approx(30.0)]
+
+def test_rate_controller_increases_additively_and_decreases_multiplicatively():
+    controller = RateController(initial_concurrency=4, max_concurrency=5, alpha=0.5, beta=0.5)
+    controller.on_throttle()
+    assert controller.concurrency == 2
+    controller.on_success(0.1)
+    controller.on_success(0.1)
+    assert controller.concurrency == 3
+    for _ in range(10):
+        controller.on_success(0.1)
+    assert controller.concurrency == 5 # 上限を超えない
+    for _ in range(10):
+        controller.on_throttle()
+    assert controller.concurrency == 1 # 下限を下回らない
+
+def test_rate_controller_blocks_when_all_slots_are_in_use():
+    controller = RateController(initial_concurrency=1, max_concurrency=1)
+    controller.acquire()
+    acquired = threading.Event()
+    def _acquire_second_slot():
+        controller.acquire()
+        acquired.set()
+    thread = threading.Thread(target=_acquire_second_slot)
+    thread.start()
+    assert not acquired.wait(0.1)
+    controller.release()
+    assert acquired.wait(1)
+    thread.join()
+
+def _http_error(status, headers=None):
+    return HttpError(httplib2.Response({"status": status, **(headers or {})}), b"error")
+
+def test_retry_waits_for_the_server_specified_retry_after(fake_clock):
+    responses = [_http_error(429, {"retry-after": "7"}), "ok"]
+    @retry_api_call(max_retries=3, initial_delay=1)
+    def _call():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    assert _call() == "ok"
+    assert fake_clock.sleeps == [7.0]
+
+def test_retry_gives_up_after_max_retries_and_throttles_the_controller(fake_clock):
+    controller = RateController(initial_concurrency=4, max_concurrency=4)
+    calls = []
+    @retry_api_call(max_retries=2, initial_delay=1, jitter=None, rate_controller=controller)
+    def _call():
+        calls.append(1)
+        raise ServiceUnavailable("unavailable")
+
+    with pytest.raises(ServiceUnavailable):
+        _call()
+    assert len(calls) == 3
+    assert fake_clock.sleeps == [1, 2] # 指数バックオフ (ジッターなし)
+    assert controller.concurrency == 1 # 4 -> 2 -> 1 -> 1
+
+def test_retry_does_not_retry_unrecoverable_errors(fake_clock):
+    calls = []
+    @retry_api_call(max_retries=3, initial_delay=1)
+    def _call():
+        calls.append(1)
+        raise _http_error(403)
+
+    with pytest.raises(HttpError):
+        _call()
+    assert len(calls) == 1
+    assert fake_clock.sleeps == []
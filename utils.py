@@ -1,24 +1,192 @@
 import time
 import functools
 import random
+import hashlib
+import sqlite3
+import threading
+import datetime
+import email.utils
+from collections import OrderedDict
 from googleapiclient.errors import HttpError
 from gspread.exceptions import APIError
+from google.api_core.exceptions import GoogleAPICallError
 
-def retry_api_call(max_retries, initial_delay=1, backoff=2, jitter=0.1,
-                   retry_status_codes=(500, 502, 503, 504)):
+def _get_status_code(e):
+    """例外オブジェクトからHTTPステータスコードを取得します。取得できない場合はNone。"""
+    if isinstance(e, HttpError) and hasattr(e, 'resp') and hasattr(e.resp, 'status'):
+        return e.resp.status
+    if isinstance(e, APIError) and hasattr(e, 'response') and hasattr(e.response, 'status_code'):
+        # gspread の APIError は response.status_code を持つ場合がある
+        return e.response.status_code
+    if isinstance(e, GoogleAPICallError):
+        # Gemini API (google.api_core) の例外は HTTP ステータスコードを code に持つ
+        return e.code
+    # TODO: 他の gspread エラーで status_code を取得する方法があればここに追加
+    return None
+
+def _parse_retry_after(value):
+    """Retry-After ヘッダーの値 (秒数またはHTTP日付) を待機秒数に変換します。解釈できない場合はNone。"""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.datetime.now(retry_at.tzinfo)).total_seconds())
+
+def _get_retry_after(e):
+    """例外オブジェクトから、サーバーが指定した再試行までの待機秒数を取得します。指定がなければNone。"""
+    if isinstance(e, HttpError) and hasattr(e, 'resp'):
+        # httplib2 のレスポンスヘッダーはキーが小文字の辞書
+        return _parse_retry_after(e.resp.get('retry-after'))
+    headers = getattr(getattr(e, 'response', None), 'headers', None)
+    if headers is not None and hasattr(headers, 'get'):
+        retry_after = _parse_retry_after(headers.get('Retry-After'))
+        if retry_after is not None:
+            return retry_after
+    if isinstance(e, GoogleAPICallError):
+        # Gemini API は RetryInfo (retry_delay) で待機時間を返すことがある
+        for detail in e.details or []:
+            retry_delay = getattr(detail, 'retry_delay', None)
+            if retry_delay is not None:
+                return retry_delay.seconds + retry_delay.nanos / 1e9
+    return None
+
+class RateController:
+    """AIMD (加算増加・乗算減少) 方式でAPI呼び出しの同時実行数を制御します。
+
+    成功した呼び出しのレイテンシ (指数移動平均) が目標以下であれば同時実行数を alpha ずつ増やし、
+    レート制限 (429) やサーバーエラー (5xx) が発生した場合は beta 倍に減らします。
+    スレッドから呼び出されることを前提とし、内部状態はロックで保護されます。
+
+    Args:
+        initial_concurrency: 初期の同時実行数。デフォルトは5。
+        min_concurrency: 同時実行数の下限。デフォルトは1。
+        max_concurrency: 同時実行数の上限。デフォルトは20。
+        alpha: 成功時に同時実行数に加算する値。デフォルトは0.5。
+        beta: レート制限時に同時実行数に乗算する係数。デフォルトは0.5。
+        target_latency: 同時実行数を増やす条件とするレイテンシの上限（秒）。Noneの場合は常に増やす。
+        ema_weight: レイテンシの指数移動平均の重み。デフォルトは0.2。
+    """
+    def __init__(self, initial_concurrency=5, min_concurrency=1, max_concurrency=20,
+                 alpha=0.5, beta=0.5, target_latency=None, ema_weight=0.2):
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.alpha = alpha
+        self.beta = beta
+        self.target_latency = target_latency
+        self.ema_weight = ema_weight
+        self.latency_ema = None
+        self._current = float(min(max(initial_concurrency, min_concurrency), max_concurrency)) # c_t
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    @property
+    def concurrency(self):
+        """現在許可されている同時実行数。"""
+        return max(self.min_concurrency, int(self._current))
+
+    def acquire(self):
+        """同時実行枠が空くまで待機し、枠を1つ確保します。"""
+        with self._condition:
+            while self._in_flight >= self.concurrency:
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self):
+        """確保した同時実行枠を解放します。"""
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self, latency):
+        """呼び出し成功を記録し、レイテンシが目標以下であれば同時実行数を増やします。"""
+        with self._condition:
+            if self.latency_ema is None:
+                self.latency_ema = latency
+            else:
+                self.latency_ema += self.ema_weight * (latency - self.latency_ema)
+            if self.target_latency is None or self.latency_ema <= self.target_latency:
+                self._current = min(float(self.max_concurrency), self._current + self.alpha)
+                self._condition.notify_all()
+
+    def on_throttle(self):
+        """レート制限やサーバーエラーを記録し、同時実行数を減らします。"""
+        with self._condition:
+            self._current = max(float(self.min_concurrency), self._current * self.beta)
+            print(f"情報: レート制限を検知したため、同時実行数を {self.concurrency} に下げます。")
+
+class RateLimiter:
+    """トークンバケット方式でAPI呼び出しの頻度 (例: 1分あたりのリクエスト数) を制限します。
+
+    period 秒あたり max_calls 回の呼び出しを許可し、上限に達した場合は次の呼び出しが許可されるまで待機します。
+    スレッドから呼び出されることを前提とし、内部状態はロックで保護されます。
+
+    Args:
+        max_calls: period 秒あたりに許可する呼び出し回数。
+        period: 呼び出し回数を数える期間（秒）。デフォルトは60秒。
+    """
+    def __init__(self, max_calls, period=60.0):
+        self.max_calls = max_calls
+        self.period = period
+        self._tokens = float(max_calls)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """呼び出しが許可されるまで待機し、許可を1つ消費します。"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                # 経過時間に応じてトークンを補充する (上限は max_calls)
+                self._tokens = min(float(self.max_calls), self._tokens + (now - self._updated_at) * self.max_calls / self.period)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) * self.period / self.max_calls
+            time.sleep(wait_time) # ロックを解放してから待機する
+
+# リトライしても成功する見込みのないステータスコード (リクエスト不正・認証エラー・権限不足)
+_UNRECOVERABLE_STATUS_CODES = (400, 401, 403)
+
+def _backoff_delay(attempt, initial_delay, backoff, max_delay, jitter):
+    """attempt 回目 (0始まり) のリトライ前の待機時間（秒）を計算します。"""
+    delay = min(max_delay, initial_delay * backoff ** attempt)
+    if jitter == "full":
+        return delay * random.random() # 0〜delay の一様分布
+    if jitter == "equal":
+        return delay * (0.5 + 0.5 * random.random()) # delay/2〜delay の一様分布
+    return delay
+
+def retry_api_call(max_retries=3, initial_delay=1.0, backoff=2, max_delay=30, jitter="full",
+                   retry_status_codes=(429, 500, 502, 503, 504), rate_controller=None, rate_limiter=None):
     """API呼び出しをリトライするデコレータ。
 
     指数バックオフとジッターを使用してリトライを行います。
-    指定されたHTTPステータスコードを持つHttpErrorまたはAPIErrorが発生した場合に
-    リトライを実行します。
+    指定されたHTTPステータスコードを持つHttpError、APIError、またはGemini APIの例外が
+    発生した場合にリトライを実行します。サーバーが Retry-After で待機時間を指定した場合は
+    その時間だけ待機します。並行して実行されている呼び出しのリトライが同じタイミングに
+    集中しないよう、デフォルトでは待機時間を 0〜遅延時間 の範囲でランダムに選びます (Full Jitter)。
+    400/401/403 など、リトライ対象外のエラーはリトライせずに直ちに送出します。
 
     Args:
-        max_retries: 最大リトライ回数。
-        initial_delay: 初回のリトライ待機時間（秒）。デフォルトは1秒。
+        max_retries: 最大リトライ回数。デフォルトは3回。
+        initial_delay: リトライ待機時間の基準値（秒）。デフォルトは1秒。
         backoff: 遅延時間を増加させる係数（例: 2は毎回2倍にする）。デフォルトは2。
-        jitter: 待機時間に加えるランダムな変動の割合（例: 0.1は±10%）。デフォルトは0.1。
+        max_delay: 遅延時間の上限（秒）。デフォルトは30秒。
+        jitter: ジッターの方式。"full" は 0〜遅延時間、"equal" は 遅延時間の半分〜遅延時間 の範囲で
+                ランダムに待機します。Noneの場合はジッターを加えません。デフォルトは "full"。
         retry_status_codes: リトライ対象とするHTTPステータスコードのタプル。
-                              デフォルトは (500, 502, 503, 504)。
+                              デフォルトは (429, 500, 502, 503, 504)。504 は DEADLINE_EXCEEDED を含みます。
+        rate_controller: 呼び出しごとに同時実行枠を確保する `RateController`。
+                         Noneの場合は同時実行数を制御しない。
+        rate_limiter: 呼び出し (リトライを含む) ごとに許可を消費する `RateLimiter`。
+                      Noneの場合は呼び出し頻度を制限しない。
 
     Returns:
         デコレートされた関数。
@@ -27,36 +195,116 @@ def retry_api_call(max_retries, initial_delay=1, backoff=2, jitter=0.1,
         @functools.wraps(func) # 元の関数のメタデータを保持
         def wrapper(*args, **kwargs): # 可変長引数に対応
             retries = 0
-            current_delay = initial_delay
             while retries <= max_retries:
+                if rate_limiter is not None:
+                    rate_limiter.acquire() # 同時実行枠を確保する前に待機し、待機中に枠を占有しないようにする
+                if rate_controller is not None:
+                    rate_controller.acquire()
+                start_time = time.monotonic()
                 try:
-                    return func(*args, **kwargs)
-                except (HttpError, APIError) as e:
-                    status_code = None
+                    result = func(*args, **kwargs)
+                    if rate_controller is not None:
+                        rate_controller.on_success(time.monotonic() - start_time)
+                    return result
+                except (HttpError, APIError, GoogleAPICallError) as e:
                     # エラーオブジェクトからステータスコードを取得
-                    if isinstance(e, HttpError) and hasattr(e, 'resp') and hasattr(e.resp, 'status'):
-                        status_code = e.resp.status
-                    elif isinstance(e, APIError) and hasattr(e, 'response') and hasattr(e.response, 'status_code'):
-                        # gspread の APIError は response.status_code を持つ場合がある
-                        status_code = e.response.status_code
-                    # TODO: 他の gspread エラーで status_code を取得する方法があればここに追加
+                    status_code = _get_status_code(e)
 
                     if status_code in retry_status_codes:
+                        if rate_controller is not None:
+                            rate_controller.on_throttle()
                         if retries < max_retries:
+                            retry_after = _get_retry_after(e)
+                            if retry_after is not None:
+                                wait_time = retry_after # サーバーが指定した待機時間を優先
+                            else:
+                                wait_time = _backoff_delay(retries, initial_delay, backoff, max_delay, jitter)
                             retries += 1 # リトライ回数をインクリメント
-                            # ジッターを加えた待機時間
-                            wait_time = current_delay + random.uniform(-jitter * current_delay, jitter * current_delay)
                             print(f"警告: API呼び出しでエラー (ステータス: {status_code})。リトライします ({retries}/{max_retries})。{wait_time:.2f}秒待機...")
-                            time.sleep(wait_time)
-                            current_delay *= backoff # 次の遅延時間を計算
                         else:
                             print(f"エラー: リトライ上限 ({max_retries}回) に達しました。ステータス: {status_code}")
                             raise e # 最終的なエラーを再送出
+                    elif status_code in _UNRECOVERABLE_STATUS_CODES:
+                        print(f"エラー: リクエストまたは認証に問題があるため、リトライせずに中断します (ステータス: {status_code})。エラー詳細: {e}")
+                        raise e
                     else:
                         print(f"情報: リトライ対象外のエラーが発生しました (ステータス: {status_code})。エラー詳細: {e}")
                         raise e # リトライ対象外のエラーは再送出
                 except Exception as e: # 予期しないその他の例外
                     print(f"エラー: API呼び出し中に予期しない例外が発生しました: {e}")
                     raise e # リトライ対象外の例外はそのまま送出
+                finally:
+                    if rate_controller is not None:
+                        rate_controller.release() # 待機中は同時実行枠を解放しておく
+                time.sleep(wait_time)
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
+
+class TranslationCache:
+    """翻訳結果のキャッシュ。
+
+    同一テキストの翻訳でAPIを再度呼び出さないよう、翻訳結果を保持します。
+    キーは (名前空間, モデル名, 改行コードと行末の空白を正規化したテキスト) のSHA-256ハッシュです。
+    段落や改行の構成が異なるテキストは別のキーになります (翻訳結果の段落構成が入れ替わらないようにする)。
+    メモリ上のLRUキャッシュに加えて、SQLiteファイルを指定した場合は
+    実行をまたいで翻訳結果を永続化します。
+
+    Args:
+        maxsize: メモリ上に保持する翻訳結果の最大件数。デフォルトは4096。
+        db_path: 永続キャッシュに使用するSQLiteファイルのパス。Noneの場合は永続化しない。
+        namespace: キーに含める文字列 (プロンプトのバージョンなど)。値が変わると以前の翻訳結果は使用されない。
+    """
+    def __init__(self, maxsize=4096, db_path=None, namespace=""):
+        self._maxsize = maxsize
+        self._namespace = namespace
+        self._memory = OrderedDict() # キー -> 翻訳結果 (末尾が最近使用したもの)
+        self._lock = threading.Lock() # 複数スレッドからの同時アクセスに備える
+        self._db = None
+        if db_path:
+            # 自動コミットモードで開く (翻訳結果を1件ずつ確実に書き込む)
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("CREATE TABLE IF NOT EXISTS translations (key TEXT PRIMARY KEY, translation TEXT NOT NULL)")
+
+    @staticmethod
+    def make_key(model_name, text, namespace=""):
+        """キャッシュのキーを作成します。改行コード (\r\n / \n) の違いと行末・末尾の空白は無視します。"""
+        normalized_text = "\n".join(line.rstrip() for line in text.replace("\r\n", "\n").split("\n")).rstrip()
+        return hashlib.sha256(f"{namespace}\0{model_name}\0{normalized_text}".encode('utf-8')).hexdigest()
+
+    def get(self, model_name, text):
+        """キャッシュされた翻訳結果を返します。見つからない場合はNone。"""
+        key = self.make_key(model_name, text, self._namespace)
+        with self._lock:
+            translation = self._memory.get(key)
+            if translation is not None:
+                self._memory.move_to_end(key)
+                return translation
+            if self._db is None:
+                return None
+            row = self._db.execute("SELECT translation FROM translations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._remember(key, row[0])
+            return row[0]
+
+    def put(self, model_name, text, translation):
+        """翻訳結果をキャッシュに保存します。同じキーの翻訳結果が既にある場合は上書きします。"""
+        key = self.make_key(model_name, text, self._namespace)
+        with self._lock:
+            self._remember(key, translation)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO translations (key, translation) VALUES (?, ?)", (key, translation))
+
+    def _remember(self, key, translation):
+        """メモリ上のLRUキャッシュに保存し、上限を超えた古いものを破棄します。"""
+        self._memory[key] = translation
+        self._memory.move_to_end(key)
+        if len(self._memory) > self._maxsize:
+            self._memory.popitem(last=False)
+
+    def close(self):
+        """永続キャッシュのファイルを閉じます。"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
\ No newline at end of file